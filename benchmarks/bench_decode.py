@@ -0,0 +1,44 @@
+"""Benchmark decoding of large containers.
+
+Run with
+
+    python benchmarks/bench_decode.py
+
+to print the time taken to decode containers with a million elements
+of common types.
+"""
+
+import collections
+import time
+
+import pygob
+
+COUNT = 1000000
+
+Point = collections.namedtuple('Point', 'X Y')
+
+CASES = [
+    ('[]int', lambda: list(range(COUNT))),
+    ('[]string', lambda: ['item%d' % i for i in range(COUNT)]),
+    ('[]byte', lambda: bytes(COUNT)),
+    ('[]Point', lambda: [Point(i, -i) for i in range(COUNT)]),
+    ('map[string]string', lambda: {'k%d' % i: 'v' for i in range(COUNT)}),
+    ('map[string]int', lambda: {'k%d' % i: i for i in range(COUNT)}),
+]
+
+
+def bench(repeat=3):
+    for name, make in CASES:
+        data = pygob.dump(make())
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            pygob.load(data)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        print('%-20s %8.3f s  %6.1f ns/element' %
+              (name, best, best / COUNT * 1e9))
+
+
+if __name__ == '__main__':
+    bench()
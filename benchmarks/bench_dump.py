@@ -0,0 +1,54 @@
+"""Benchmark encoding of structs with a Dumper.
+
+Run with
+
+    python benchmarks/bench_dump.py
+
+to print the time and the number of bytes per encoded value, both
+without and with the length prefix and type ID of its segment. The
+type definitions are sent once and are not included.
+"""
+
+import collections
+import time
+
+import pygob
+from pygob.types import INT, STRING, FLOAT
+
+Order = collections.namedtuple('Order', 'Id Kind Price Quantity Tags Note')
+
+
+def orders(count):
+    for i in range(count):
+        # Most fields are zero in a typical order.
+        yield Order(i, 'buy' if i % 10 else 'sell', 0.0, i % 3, [], '')
+
+
+def bench(count):
+    stats = pygob.Stats()
+    dumper = pygob.Dumper(stats=stats)
+    tags = dumper.typeid(['tag'])
+    dumper.register(Order, [('Id', INT), ('Kind', STRING), ('Price', FLOAT),
+                            ('Quantity', INT), ('Tags', tags),
+                            ('Note', STRING)])
+    # The first value is sent after the type definitions.
+    zero = Order(0, '', 0.0, 0, [], '')
+    definitions = len(dumper.dump(zero)) - len(dumper.dump(zero))
+    typeid = dumper.typeid(zero)
+    before = stats.bytes[typeid]
+    total = 0
+    start = time.perf_counter()
+    for order in orders(count):
+        total += len(dumper.dump(order))
+    seconds = time.perf_counter() - start
+
+    values = stats.bytes[typeid] - before
+    print('%d values in %.3f s, %.2f us/value' %
+          (count, seconds, seconds / count * 1e6))
+    print('%.2f bytes/value, %.2f with segment headers, '
+          '%d bytes of type definitions' %
+          (values / count, total / count, definitions))
+
+
+if __name__ == '__main__':
+    bench(100000)
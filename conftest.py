@@ -0,0 +1,25 @@
+import collections
+import sys
+
+import pytest
+
+# Modules with async def cannot even be compiled before Python 3.5.
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore += ['pygob/rpc/aio.py', 'tests/test_rpc_aio.py']
+
+
+@pytest.fixture
+def points():
+    """A gob stream of the Go values Point{0, 0} and Point{3, 4}."""
+    return bytes([
+        31, 255, 131, 3, 1, 1, 5, 80, 111, 105, 110, 116, 1, 255, 132, 0, 1,
+        2, 1, 1, 88, 1, 4, 0, 1, 1, 89, 1, 4, 0, 0, 0, 3, 255, 132, 0, 7, 255,
+        132, 1, 6, 1, 8, 0
+    ])
+
+
+@pytest.fixture
+def Point():
+    """The named tuple class the points stream is decoded to."""
+    return collections.namedtuple('Point', ['X', 'Y'])
@@ -1,17 +1,32 @@
-from .loader import Loader
+from .loader import Loader, TypeSnapshot  # noqa: F401
 from .dumper import Dumper
+from .decoder import Decoder, Framer  # noqa: F401
+from .instrument import Stats  # noqa: F401
+from .stream import load_stream, StreamWriter  # noqa: F401
+from .cache import TypeCache, ValueMemo  # noqa: F401
+from .router import merge  # noqa: F401
 
 
-def load(buf):
+def load(buf, type_cache=None):
     """Load and decode a bytes object."""
-    loader = Loader()
+    loader = Loader(type_cache=type_cache)
     return loader.load(buf)
 
 
-def load_all(buf):
-    """Decode all gobs in a bytes object."""
+def load_all(buf, type_cache=None, where=None):
+    """Decode all gobs in a bytes object.
+
+    With where, only structs matching the predicate are returned, see
+    `Loader.load_all`.
+    """
+    loader = Loader(type_cache=type_cache)
+    return loader.load_all(buf, where)
+
+
+def load_columns(buf):
+    """Decode a stream of structs into a dict of columns."""
     loader = Loader()
-    return loader.load_all(buf)
+    return loader.load_columns(buf)
 
 
 def dump(value):
@@ -0,0 +1,106 @@
+"""Command line tools for gob streams.
+
+Run python -m pygob --help for a list of commands.
+"""
+
+import argparse
+import sys
+
+from . import catalog, schema, transcode
+
+
+def open_input(path):
+    if path == '-':
+        return sys.stdin.buffer
+    return open(path, 'rb')
+
+
+def open_output(path):
+    if path == '-':
+        return sys.stdout.buffer
+    return open(path, 'wb')
+
+
+def compression_arg(value):
+    return None if value == 'none' else value
+
+
+def cmd_transcode(args):
+    src = open_input(args.input)
+    dst = open_output(args.output)
+    try:
+        transcode.transcode(src, dst, args.format, args.compression)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        if dst is not sys.stdout.buffer:
+            dst.close()
+
+
+def cmd_compile(args):
+    if args.input.endswith('.go'):
+        with open(args.input, encoding='utf-8') as fp:
+            structs = schema.parse_go(fp.read())
+    else:
+        src = open_input(args.input)
+        try:
+            structs = schema.parse_gob(src.read())
+        finally:
+            if src is not sys.stdin.buffer:
+                src.close()
+    source = schema.generate(structs, args.input).encode('utf-8')
+    dst = open_output(args.output)
+    try:
+        dst.write(source)
+    finally:
+        if dst is not sys.stdout.buffer:
+            dst.close()
+
+
+def cmd_stat(args):
+    result = catalog.catalog_file(args.input, args.compression)
+    print(result.report())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pygob')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    parser_transcode = commands.add_parser(
+        'transcode', help='convert a gob stream to another format')
+    parser_transcode.add_argument('input', help='gob file, - for stdin')
+    parser_transcode.add_argument('output', nargs='?', default='-',
+                                  help='output file, - for stdout')
+    parser_transcode.add_argument('-f', '--format', default='ndjson',
+                                  choices=sorted(transcode.FORMATS))
+    parser_transcode.add_argument(
+        '-c', '--compression', default='auto', type=compression_arg,
+        choices=['auto', None, 'zlib', 'gzip', 'bz2', 'lzma'],
+        help='compression of the input (default: auto)')
+    parser_transcode.set_defaults(func=cmd_transcode)
+
+    parser_compile = commands.add_parser(
+        'compile', help='generate decoders for a schema')
+    parser_compile.add_argument(
+        'input', help='Go source with type declarations (*.go) or a gob '
+        'file starting with type definitions, - for stdin')
+    parser_compile.add_argument('output', nargs='?', default='-',
+                                help='Python module, - for stdout')
+    parser_compile.set_defaults(func=cmd_compile)
+
+    parser_stat = commands.add_parser(
+        'stat', help='list the types and value sizes in a gob file')
+    parser_stat.add_argument('input', help='gob file')
+    parser_stat.add_argument(
+        '-c', '--compression', default='auto', type=compression_arg,
+        choices=['auto', None, 'zlib', 'gzip', 'bz2', 'lzma'],
+        help='compression of the input (default: auto)')
+    parser_stat.set_defaults(func=cmd_stat)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Caches of decoded type definitions and values.
+
+Gob streams written by the same program repeat the same type
+definitions. A `TypeCache` shared between loaders remembers the types
+decoded from each definition segment and hands out copies when the
+exact same bytes are seen again. This skips decoding the wire type and
+building the named tuple class of a struct.
+
+Many streams also repeat the same values, such as heartbeats. A
+`ValueMemo` remembers the values decoded from recent value segments.
+"""
+
+import collections
+
+from .loader import Loader
+from .types import GoInt, GoUint, GoStruct, GoArray, WIRE_TYPE, dependencies
+
+
+# Marks a segment which has not been decoded before.
+_MISSING = object()
+
+
+class TypeCache:
+    """Map raw type definition segments to decoded types.
+
+    The raw bytes of a definition fully determine the type: other
+    types are only referenced by their IDs, and those are looked up
+    in the loader decoding the current stream. Cached types are
+    therefore bound to that loader when they are handed out.
+    """
+
+    def __init__(self):
+        self._types = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._types)
+
+    def get(self, typeid, segment, loader):
+        """Return the type defined by segment bound to loader, or None."""
+        go_type = self._types.get((typeid, bytes(segment)))
+        if go_type is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return go_type.bind(loader)
+
+    def add(self, typeid, segment, go_type):
+        """Remember the type decoded from a definition segment."""
+        self._types[(typeid, bytes(segment))] = go_type.bind(None)
+
+    def save(self, fp):
+        """Write the cached definitions to a binary file object.
+
+        The definitions are written as gob segments, as they appeared
+        in the original streams.
+        """
+        for typeid, segment in self._types:
+            segment = GoInt.encode(-typeid) + segment
+            fp.write(GoUint.encode(len(segment)))
+            fp.write(segment)
+
+    def load(self, fp):
+        """Read definitions written by save into the cache."""
+        loader = Loader()
+        buf = fp.read()
+        while buf:
+            segment, buf = loader._read_segment(buf)
+            typeid, segment = GoInt.decode(segment)
+            go_type, rest = loader.decode_value(WIRE_TYPE, segment)
+            assert rest == b'', 'trailing data in segment: %s' % list(rest)
+            self.add(-typeid, segment, go_type)
+
+
+def _immutable(loader, typeid):
+    """Return True if the values of typeid are immutable.
+
+    Structs and arrays are immutable if all the types they are made
+    of are. Recursive references do not make a type mutable, so each
+    type is looked at once.
+    """
+    seen = set()
+    stack = [typeid]
+    while stack:
+        typeid = stack.pop()
+        if typeid in seen:
+            continue
+        seen.add(typeid)
+        go_type = loader.get_type(typeid)
+        if go_type is None:
+            return False
+        if isinstance(go_type, (GoStruct, GoArray)):
+            stack.extend(dependencies(go_type))
+        elif go_type._zero_parts()[1] is not None:
+            return False  # types with mutable zero values are mutable
+    return True
+
+
+MemoInfo = collections.namedtuple('MemoInfo', 'hits misses maxsize currsize')
+
+
+class ValueMemo:
+    """A bounded LRU cache of decoded values for a single `Loader`.
+
+    Values are keyed by their type ID and the raw bytes of their
+    segment, so a memo must not be shared between loaders. Only
+    values of immutable types are remembered: bools, numbers, strings
+    and structs and arrays made of those. Segments longer than
+    max_segment_size are always decoded.
+
+    >>> import pygob
+    >>> memo = ValueMemo(maxsize=16)
+    >>> loader = pygob.Loader(memo=memo)
+    >>> list(loader.load_all(bytes([3, 4, 0, 2, 3, 4, 0, 2, 3, 4, 0, 4])))
+    [1, 1, 2]
+    >>> memo.info()
+    MemoInfo(hits=1, misses=2, maxsize=16, currsize=2)
+    """
+
+    def __init__(self, maxsize=1024, max_segment_size=1024):
+        self.maxsize = maxsize
+        self.max_segment_size = max_segment_size
+        self.hits = 0
+        self.misses = 0
+        self._values = collections.OrderedDict()
+        self._immutable = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def info(self):
+        """Return the hits, misses, maximum and current size."""
+        return MemoInfo(self.hits, self.misses, self.maxsize,
+                        len(self._values))
+
+    def clear(self):
+        self._values.clear()
+        self.hits = self.misses = 0
+
+    def install(self, loader):
+        """Wrap the value decoding of loader with the memo."""
+        decode_segment = loader._decode_segment
+        values = self._values
+        immutable = self._immutable
+
+        def _decode_segment(typeid, segment):
+            cacheable = immutable.get(typeid)
+            if cacheable is None:
+                if loader.get_type(typeid) is None:
+                    return decode_segment(typeid, segment)
+                cacheable = immutable[typeid] = _immutable(loader, typeid)
+            if not cacheable or len(segment) > self.max_segment_size:
+                return decode_segment(typeid, segment)
+
+            key = (typeid, bytes(segment))
+            value = values.get(key, _MISSING)
+            if value is not _MISSING:
+                self.hits += 1
+                values.move_to_end(key)
+                return value
+            self.misses += 1
+            value = decode_segment(typeid, segment)
+            values[key] = value
+            if len(values) > self.maxsize:
+                values.popitem(last=False)
+            return value
+
+        loader._decode_segment = _decode_segment
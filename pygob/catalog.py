@@ -0,0 +1,181 @@
+"""Inspection of gob streams without decoding their values.
+
+A `Catalog` lists the types defined in a stream together with the
+number of values of each type, their total size and the distribution
+of their sizes. Only the length prefix and type ID of each value
+segment is read, type definitions are decoded as usual.
+"""
+
+import array
+import collections
+import mmap
+
+from .decoder import Framer
+from .loader import Loader
+from .stream import CHUNK_SIZE, detect_compression, read_chunks
+from .types import (GoInt, GoUint, GoStruct, GoSlice, GoArray, GoMap,
+                    BOOL, INT, UINT, FLOAT, BYTE_SLICE, STRING, COMPLEX,
+                    INTERFACE)
+
+# Go names of the predeclared types.
+TYPE_NAMES = {
+    BOOL: 'bool',
+    INT: 'int',
+    UINT: 'uint',
+    FLOAT: 'float64',
+    BYTE_SLICE: '[]byte',
+    STRING: 'string',
+    COMPLEX: 'complex128',
+    INTERFACE: 'interface{}',
+}
+
+PERCENTILES = (50, 90, 99, 100)
+
+
+class Catalog:
+    """Types and value statistics of a gob stream.
+
+    >>> catalog = Catalog()
+    >>> catalog.scan(bytes([3, 4, 0, 2, 3, 4, 0, 4, 4, 12, 0, 1, 33]))
+    >>> catalog.counts
+    Counter({2: 2, 6: 1})
+    >>> catalog.percentile(2, 50)
+    4
+    """
+
+    def __init__(self):
+        self.loader = Loader()
+        # Type IDs in the order they were defined.
+        self.defined = []
+        self.counts = collections.Counter()
+        self.bytes = collections.Counter()
+        # Sizes of the value segments of each type, with their length
+        # prefix, in compact arrays.
+        self.sizes = collections.defaultdict(lambda: array.array('L'))
+
+    def scan(self, buf):
+        """Add the segments in buf, which can be any buffer such as a
+        bytes object or an mmap."""
+        uint_at = GoUint.decode_at
+        int_at = GoInt.decode_at
+        counts = self.counts
+        sizes = self.sizes
+        pos = 0
+        end = len(buf)
+        with memoryview(buf) as view:
+            while pos < end:
+                length, start = uint_at(view, pos)
+                stop = start + length
+                assert stop <= end, 'truncated segment at %d' % pos
+                # Only the type ID of a value is read.
+                typeid, body = int_at(view, start)
+                if typeid < 0:
+                    self._define(-typeid, view[body:stop])
+                else:
+                    counts[typeid] += 1
+                    sizes[typeid].append(stop - pos)
+                pos = stop
+        self._sum_bytes()
+
+    def scan_chunks(self, chunks):
+        """Add the segments in an iterable of chunks."""
+        framer = Framer()
+        for chunk in chunks:
+            for segment in framer.feed(chunk):
+                self._add(segment, len(GoUint.encode(len(segment))) +
+                          len(segment))
+        framer.close()
+        self._sum_bytes()
+
+    def _add(self, segment, size):
+        typeid, pos = GoInt.decode_at(segment, 0)
+        if typeid < 0:
+            self._define(-typeid, segment[pos:])
+        else:
+            self.counts[typeid] += 1
+            self.sizes[typeid].append(size)
+
+    def _define(self, typeid, segment):
+        self.loader._register_type(typeid, bytes(segment))
+        self.defined.append(typeid)
+
+    def _sum_bytes(self):
+        for typeid, sizes in self.sizes.items():
+            self.bytes[typeid] = sum(sizes)
+
+    def percentile(self, typeid, percent):
+        """Return the value size below which percent of the values of
+        typeid are, using the nearest-rank method."""
+        return self.percentiles(typeid, [percent])[0]
+
+    def percentiles(self, typeid, percents=PERCENTILES):
+        """Return several percentiles of the value sizes of typeid."""
+        sizes = sorted(self.sizes[typeid])
+        if not sizes:
+            return [0] * len(percents)
+        return [sizes[max(1, -(-percent * len(sizes) // 100)) - 1]
+                for percent in percents]
+
+    def describe(self, typeid):
+        """Return a Go-like description of a type."""
+        if typeid in TYPE_NAMES:
+            return TYPE_NAMES[typeid]
+        go_type = self.loader.get_type(typeid)
+        if isinstance(go_type, GoStruct):
+            return 'struct %s {%s}' % (go_type._name, ', '.join(
+                '%s %s' % (name, self._name(t))
+                for (name, t) in go_type._fields))
+        if isinstance(go_type, GoSlice):
+            return '[]%s' % self._name(go_type._elem)
+        if isinstance(go_type, GoArray):
+            return '[%d]%s' % (go_type._length, self._name(go_type._elem))
+        if isinstance(go_type, GoMap):
+            return 'map[%s]%s' % (self._name(go_type._key_typeid),
+                                  self._name(go_type._elem_typeid))
+        return 'type %d' % typeid
+
+    def _name(self, typeid):
+        go_type = self.loader.get_type(typeid)
+        if isinstance(go_type, GoStruct):
+            return go_type._name
+        return self.describe(typeid)
+
+    def report(self):
+        """Return a text report of the types and values."""
+        lines = ['types:']
+        for typeid in self.defined:
+            lines.append('  %5d  %s' % (typeid, self.describe(typeid)))
+        lines.append('')
+        lines.append('values:')
+        header = ['type', 'count', 'bytes'] + ['p%d' % p for p in PERCENTILES]
+        lines.append('  %5s %10s %12s' % tuple(header[:3]) +
+                     ''.join(' %8s' % h for h in header[3:]) + '  name')
+        for typeid in sorted(self.counts):
+            row = '  %5d %10d %12d' % (typeid, self.counts[typeid],
+                                       self.bytes[typeid])
+            row += ''.join(' %8d' % size
+                           for size in self.percentiles(typeid))
+            lines.append(row + '  ' + self._name(typeid))
+        lines.append('')
+        lines.append('total: %d values, %d bytes' %
+                     (sum(self.counts.values()), sum(self.bytes.values())))
+        return '\n'.join(lines)
+
+
+def catalog_file(path, compression='auto', chunk_size=CHUNK_SIZE):
+    """Scan a gob file. Uncompressed files are memory mapped."""
+    catalog = Catalog()
+    with open(path, 'rb') as fp:
+        if compression == 'auto':
+            compression = detect_compression(fp.read(16))
+            fp.seek(0)
+        if compression is not None:
+            catalog.scan_chunks(read_chunks(fp, compression, chunk_size))
+            return catalog
+        try:
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return catalog  # an empty file cannot be mapped
+        with data:
+            catalog.scan(data)
+    return catalog
@@ -0,0 +1,125 @@
+"""Incremental decoding of gob streams.
+
+The classes here do no I/O of their own: bytes are pushed in as they
+arrive from a socket, pipe or message queue and values come out as
+soon as their segment is complete. This makes it easy to plug gob
+decoding into any transport or event loop.
+"""
+
+from .loader import Loader
+
+
+def _read_uint(buf, pos):
+    """Read an unsigned integer from buf at pos. Returns the integer and
+    the position after it, or None if buf ends before the integer:
+
+    >>> _read_uint(bytes([56]), 0)
+    (56, 1)
+    >>> _read_uint(bytes([254, 1, 0]), 0)
+    (256, 3)
+    >>> _read_uint(bytes([254, 1]), 0) is None
+    True
+    """
+    if pos >= len(buf):
+        return None
+    if buf[pos] < 128:  # small uint in a single byte
+        return buf[pos], pos + 1
+
+    # larger uint split over multiple bytes
+    end = pos + 1 + 256 - buf[pos]
+    if end > len(buf):
+        return None
+    return int.from_bytes(buf[pos + 1:end], 'big'), end
+
+
+class Framer:
+    """Split a gob stream into segments.
+
+    Data is fed in chunks of any size and the complete segments are
+    returned without their length prefix:
+
+    >>> framer = Framer()
+    >>> list(framer.feed(bytes([3, 4, 0])))
+    []
+    >>> list(framer.feed(bytes([2, 3, 4, 0, 4])))
+    [b'\\x04\\x00\\x02', b'\\x04\\x00\\x04']
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0
+
+    def feed(self, data):
+        """Add data to the stream and return an iterator over the
+        segments completed so far.
+
+        The data is buffered immediately, but segments are only
+        consumed when the iterator is advanced.
+        """
+        self._buffer += data
+        return self._segments()
+
+    def _segments(self):
+        buf = self._buffer
+        while True:
+            header = _read_uint(buf, self._pos)
+            if header is None:
+                break
+            length, start = header
+            end = start + length
+            if end > len(buf):
+                break
+            with memoryview(buf) as view:
+                segment = bytes(view[start:end])
+            self._pos = end
+            yield segment
+
+        # Drop consumed bytes once they make up half of the buffer.
+        # Each byte is thus moved a bounded number of times.
+        if self._pos and self._pos * 2 >= len(buf):
+            del buf[:self._pos]
+            self._pos = 0
+
+    @property
+    def pending(self):
+        """Number of buffered bytes not yet returned as segments."""
+        return len(self._buffer) - self._pos
+
+    def close(self):
+        """Signal the end of the stream."""
+        assert self.pending == 0, ('truncated segment: %s' %
+                                   list(self._buffer[self._pos:]))
+
+
+class Decoder:
+    """Decode gob values from a stream fed in chunks:
+
+    >>> decoder = Decoder()
+    >>> list(decoder.feed(bytes([3, 4, 0, 2, 3])))
+    [1]
+    >>> list(decoder.feed(bytes([4, 0, 4])))
+    [2]
+    >>> decoder.close()
+
+    Type definitions are remembered between calls to feed.
+    """
+
+    def __init__(self, loader=None):
+        self.loader = Loader() if loader is None else loader
+        self._framer = Framer()
+
+    def feed(self, data):
+        """Add data to the stream and return an iterator over the values
+        completed so far."""
+        return self._values(self._framer.feed(data))
+
+    def _values(self, segments):
+        load_segment = self.loader._load_segment
+        for segment in segments:
+            typeid, value = load_segment(segment)
+            if typeid > 0:
+                yield value
+
+    def close(self):
+        """Signal the end of the stream."""
+        self._framer.close()
@@ -1,35 +1,186 @@
 import io
 
+from .instrument import instrument_dumper
+from .loader import Loader
 from .types import (GoBool, GoInt, GoUint, GoFloat, GoStruct, GoByteSlice,
-                    GoString, GoComplex)
+                    GoString, GoComplex, GoSlice, GoArray, GoMap,
+                    WIRE_TYPE, COMMON_TYPE, ARRAY_TYPE, SLICE_TYPE,
+                    STRUCT_TYPE, FIELD_TYPE, MAP_TYPE, FIRST_CUSTOM_TYPE)
 
 
 class Dumper:
-    def __init__(self):
+    """Encode Python values to a gob stream.
+
+    Like a Go encoder, a dumper keeps track of the custom types it has
+    sent. The definition of a type is sent before the first value of
+    that type and never again.
+    """
+
+    def __init__(self, stats=None):
         self.types = {
             bool: GoBool,
             int: GoInt,
             float: GoFloat,
             bytes: GoByteSlice,
+            bytearray: GoByteSlice,
             str: GoString,
             complex: GoComplex,
         }
 
+        # Custom types are registered in a loader, which also has the
+        # wire types used to encode their definitions.
+        self._loader = Loader()
+        self._custom = {}
+        self._compound = {}
+        self._sent = set()
+
+        if stats is not None:
+            instrument_dumper(self, stats)
+
+    def register(self, cls, fields):
+        """Register a named tuple class as a Go struct.
+
+        The fields are (name, typeid) pairs in the order of the named
+        tuple fields. This allows picking Go types which cannot be
+        inferred from Python values, such as unsigned integers:
+
+        >>> import collections
+        >>> from pygob.types import UINT, STRING
+        >>> Request = collections.namedtuple('Request', 'ServiceMethod Seq')
+        >>> dumper = Dumper()
+        >>> dumper.register(Request, [('ServiceMethod', STRING),
+        ...                           ('Seq', UINT)])
+        <GoStruct Request ServiceMethod=6, Seq=3>
+        """
+        go_type = GoStruct(self._next_typeid(), cls.__name__, self._loader,
+                           fields)
+        self.types[cls] = go_type
+        self._add_custom(go_type)
+        return go_type
+
+    def typeid(self, value):
+        """Return the type ID used to encode value, registering new custom
+        types as needed."""
+        return self._go_type(value).typeid
+
     def dump(self, value):
         return self._dump(value)
 
     def _dump(self, value):
+        go_type = self._go_type(value)
+        undefined = self._undefined(go_type)
+        try:
+            parts = [self._define(t) for t in undefined]
+            parts.append(self._encode_segment(go_type, value))
+        except Exception:
+            # Nothing was sent after all.
+            self._sent.difference_update(t.typeid for t in undefined)
+            raise
+        return b''.join(parts)
+
+    def _encode_segment(self, go_type, value):
         # Top-level singletons are sent with an extra zero byte which
         # serves as a kind of field delta.
-        python_type = type(value)
-        go_type = self.types.get(python_type)
-        if go_type is None:
-            raise NotImplementedError("cannot encode %s of type %s" %
-                                      (value, python_type))
-
         segment = io.BytesIO()
         segment.write(GoInt.encode(go_type.typeid))
         if not isinstance(go_type, GoStruct):
             segment.write(b'\x00')
         segment.write(go_type.encode(value))
         return GoUint.encode(segment.tell()) + segment.getvalue()
+
+    def _define(self, go_type):
+        """Encode the definition of a custom type."""
+        types = self._loader.types
+        wire_type = types[WIRE_TYPE]
+        name = getattr(go_type, '_name', '')
+        common = types[COMMON_TYPE]._class(name, go_type.typeid)
+        if isinstance(go_type, GoStruct):
+            field_type = types[FIELD_TYPE]._class
+            fields = [field_type(n, t) for (n, t) in go_type._fields]
+            struct_type = types[STRUCT_TYPE]._class(common, fields)
+            wire = wire_type._class(None, None, struct_type, None)
+        elif isinstance(go_type, GoSlice):
+            slice_type = types[SLICE_TYPE]._class(common, go_type._elem)
+            wire = wire_type._class(None, slice_type, None, None)
+        elif isinstance(go_type, GoArray):
+            array_type = types[ARRAY_TYPE]._class(common, go_type._elem,
+                                                  go_type._length)
+            wire = wire_type._class(array_type, None, None, None)
+        else:
+            map_type = types[MAP_TYPE]._class(common, go_type._key_typeid,
+                                              go_type._elem_typeid)
+            wire = wire_type._class(None, None, None, map_type)
+
+        segment = GoInt.encode(-go_type.typeid) + wire_type.encode(wire)
+        return GoUint.encode(len(segment)) + segment
+
+    def _undefined(self, go_type):
+        """Return the custom types go_type depends on which have not been
+        sent yet, in the order they should be sent."""
+        result = []
+        stack = [go_type.typeid]
+        while stack:
+            typeid = stack.pop()
+            custom_type = self._custom.get(typeid)
+            if custom_type is None or typeid in self._sent:
+                continue
+            self._sent.add(typeid)
+            result.append(custom_type)
+            if isinstance(custom_type, GoStruct):
+                stack.extend(t for (n, t) in custom_type._fields)
+            elif isinstance(custom_type, GoMap):
+                stack.append(custom_type._key_typeid)
+                stack.append(custom_type._elem_typeid)
+            else:
+                stack.append(custom_type._elem)
+        return result
+
+    def _next_typeid(self):
+        return FIRST_CUSTOM_TYPE + len(self._custom)
+
+    def _add_custom(self, go_type):
+        self._custom[go_type.typeid] = go_type
+        self._loader.add_type(go_type.typeid, go_type)
+
+    def _go_type(self, value):
+        python_type = type(value)
+        go_type = self.types.get(python_type)
+        if go_type is not None:
+            return go_type
+
+        if isinstance(value, tuple) and hasattr(value, '_fields'):
+            fields = [(name, self._infer(value, name, field).typeid)
+                      for name, field in zip(value._fields, value)]
+            return self.register(python_type, fields)
+        if isinstance(value, list):
+            elem = self._infer(value, 'element', value[0] if value else None)
+            return self._compound_type(GoSlice, elem.typeid)
+        if isinstance(value, tuple):
+            elem = self._infer(value, 'element', value[0] if value else None)
+            return self._compound_type(GoArray, elem.typeid, len(value))
+        if isinstance(value, dict):
+            key, elem = next(iter(value.items()), (None, None))
+            key_type = self._infer(value, 'key', key)
+            elem_type = self._infer(value, 'element', elem)
+            return self._compound_type(GoMap, key_type.typeid,
+                                       elem_type.typeid)
+
+        raise NotImplementedError("cannot encode %s of type %s" %
+                                  (value, python_type))
+
+    def _infer(self, value, what, example):
+        if example is None:
+            raise NotImplementedError("cannot infer %s type of %s" %
+                                      (what, value))
+        return self._go_type(example)
+
+    def _compound_type(self, cls, *args):
+        # Slices, arrays and maps are unnamed and identified by their
+        # element types alone.
+        key = (cls, ) + args
+        go_type = self._compound.get(key)
+        if go_type is None:
+            go_type = cls(self._next_typeid(), self._loader, *args)
+            self._compound[key] = go_type
+            self._add_custom(go_type)
+        return go_type
@@ -0,0 +1,366 @@
+"""Decoding of nested values with an explicit stack.
+
+Structs, slices, arrays and maps can be nested arbitrarily deep, and
+recursive Go types such as
+
+    type Node struct {
+        Value int
+        Next  *Node
+    }
+
+produce values nested as deep as the data goes. Decoding such values
+with one Python call per level would run into the recursion limit.
+Instead, `decode_at` keeps a stack of the containers being decoded
+and resolves element and field types through the type table of the
+loader as it goes.
+"""
+
+# The kinds of Go types, stored as the kind attribute of each GoType.
+SCALAR = 1
+STRUCT = 2
+SLICE = 3
+ARRAY = 4
+MAP = 5
+
+# Type IDs of integers and strings, which have fast paths. These are
+# INT and STRING from pygob.types, which imports this module.
+INT_TYPEID = 2
+STRING_TYPEID = 6
+
+# Marks a struct frame which has not received a field value yet and
+# a map frame which is waiting for its next key.
+_NOTHING = object()
+
+
+def _uint_at(buf, pos):
+    n = buf[pos]
+    if n < 128:
+        return n, pos + 1
+    end = pos + 257 - n
+    return int.from_bytes(buf[pos + 1:end], 'big'), end
+
+
+def _strings_at(buf, pos, count):
+    """Decode count strings, the most common elements of slices and
+    maps, with the string decoding inlined."""
+    result = [None] * count
+    for i in range(count):
+        n = buf[pos]
+        if n < 128:
+            pos += 1
+        else:
+            n, pos = _uint_at(buf, pos)
+        end = pos + n
+        result[i] = bytes(buf[pos:end])
+        pos = end
+    return result, pos
+
+
+def _ints_at(buf, pos, count):
+    """Decode count signed integers with the decoding inlined."""
+    result = [None] * count
+    from_bytes = int.from_bytes
+    for i in range(count):
+        n = buf[pos]
+        if n < 128:
+            pos += 1
+        else:
+            end = pos + 257 - n
+            n = from_bytes(buf[pos + 1:end], 'big')
+            pos = end
+        result[i] = ~n >> 1 if n & 1 else n >> 1
+    return result, pos
+
+
+def _elements_at(decode, buf, pos, count):
+    result = [None] * count
+    for i in range(count):
+        result[i], pos = decode(buf, pos)
+    return result, pos
+
+
+def _flat_struct_decoder(go_type):
+    """Return a function decoding go_type if all its fields are
+    scalars, otherwise None."""
+    types = go_type._loader.types
+    decoders = []
+    for name, typeid in go_type._fields:
+        field_type = types[typeid]
+        if field_type.kind != SCALAR:
+            return None
+        decoders.append(field_type.decode_at)
+    template, fresh = go_type._zero_values()
+    make = go_type._make
+
+    def decode(buf, pos):
+        values = list(template)
+        field_id = -1
+        while True:
+            delta = buf[pos]
+            if delta < 128:
+                pos += 1
+            else:
+                delta, pos = _uint_at(buf, pos)
+            if not delta:
+                break
+            field_id += delta
+            values[field_id], pos = decoders[field_id](buf, pos)
+        for i, factory in fresh:
+            if values[i] is None:
+                values[i] = factory()
+        return make(values), pos
+
+    return decode
+
+
+def fast_decoder(go_type):
+    """Return a function decode(buf, pos) for scalars and structs of
+    scalars, which need no stack, or None for other types."""
+    kind = go_type.kind
+    if kind == SCALAR:
+        return go_type.decode_at
+    if kind == STRUCT:
+        decode = go_type._fast
+        if decode is None:
+            decode = _flat_struct_decoder(go_type) or False
+            go_type._fast = decode
+        return decode or None
+    return None
+
+
+def _sequence_at(elem, buf, pos, count):
+    """Decode count elements of type elem without the stack, or return
+    None if elem needs the stack."""
+    typeid = elem.typeid
+    if typeid == STRING_TYPEID:
+        return _strings_at(buf, pos, count)
+    if typeid == INT_TYPEID:
+        return _ints_at(buf, pos, count)
+    decode = fast_decoder(elem)
+    if decode is None:
+        return None
+    return _elements_at(decode, buf, pos, count)
+
+
+def _map_at(key_type, elem_type, buf, pos, count):
+    """Decode a map with count entries without the stack, or return
+    None if the key or element type needs the stack."""
+    decode_key = fast_decoder(key_type)
+    decode_elem = fast_decoder(elem_type)
+    if decode_key is None or decode_elem is None:
+        return None
+    result = {}
+    if key_type.typeid == STRING_TYPEID:
+        for i in range(count):
+            n = buf[pos]
+            if n < 128:
+                pos += 1
+            else:
+                n, pos = _uint_at(buf, pos)
+            end = pos + n
+            result[bytes(buf[pos:end])], pos = decode_elem(buf, end)
+    else:
+        for i in range(count):
+            key, pos = decode_key(buf, pos)
+            result[key], pos = decode_elem(buf, pos)
+    return result, pos
+
+
+def _finish_struct(frame):
+    go_type, values, field_id, fresh = frame[1:5]
+    # Mutable zero values are made only for the fields not sent.
+    for i, factory in fresh:
+        if values[i] is None:
+            values[i] = factory()
+    return go_type._make(values)
+
+
+def decode_at(go_type, buf, pos):
+    """Decode a value of go_type from buf at position pos. Returns the
+    value and the position after it.
+
+    Each frame on the stack is a list starting with the kind of the
+    container being decoded. Struct frames hold the type, the field
+    values, the current field and the fields with mutable zero
+    values. Slice and array frames hold the type, the pre-sized list
+    of elements, the index of the next element and the element type.
+    Map frames hold the type, the dict, the remaining count, the key
+    and element types and the key of the element being decoded.
+
+    Scalars, structs of scalars and containers of those are decoded
+    in tight loops without the stack.
+    """
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    value = _NOTHING
+    while True:
+        # Start decoding a value of go_type.
+        kind = go_type.kind
+        if kind == SCALAR:
+            value, pos = go_type.decode_at(buf, pos)
+        elif kind == STRUCT:
+            decode = go_type._fast
+            if decode is None:
+                decode = fast_decoder(go_type)
+            if decode:
+                value, pos = decode(buf, pos)
+            else:
+                template, fresh = go_type._zero_values()
+                push([STRUCT, go_type, list(template), -1, fresh])
+                value = _NOTHING
+        elif kind == SLICE or kind == ARRAY:
+            count, pos = _uint_at(buf, pos)
+            if kind == ARRAY:
+                length = go_type._length
+                assert count == length, \
+                    "expected %d elements, found %d" % (length, count)
+            if count:
+                elem = go_type._loader.types[go_type._elem]
+                decoded = _sequence_at(elem, buf, pos, count)
+                if decoded is None:
+                    # The list is filled in by index as elements are
+                    # decoded.
+                    push([kind, go_type, [None] * count, 0, elem])
+                    go_type = elem
+                    continue
+                value, pos = decoded
+                if kind == ARRAY:
+                    value = tuple(value)
+            else:
+                value = [] if kind == SLICE else ()
+        elif kind == MAP:
+            count, pos = _uint_at(buf, pos)
+            if count:
+                types = go_type._loader.types
+                key_type = types[go_type._key_typeid]
+                elem_type = types[go_type._elem_typeid]
+                decoded = _map_at(key_type, elem_type, buf, pos, count)
+                if decoded is None:
+                    push([MAP, go_type, {}, count, key_type, elem_type,
+                          _NOTHING])
+                    go_type = key_type
+                    continue
+                value, pos = decoded
+            else:
+                value = {}
+        else:
+            # Types of unknown kind decode themselves.
+            value, rest = go_type.decode(buf[pos:])
+            pos = len(buf) - len(rest)
+
+        # Hand the value to the innermost container, finishing the
+        # containers which are then complete.
+        while stack:
+            frame = stack[-1]
+            kind = frame[0]
+            if kind == STRUCT:
+                if value is not _NOTHING:
+                    frame[2][frame[3]] = value
+                delta, pos = _uint_at(buf, pos)
+                if delta:
+                    frame[3] += delta
+                    struct_type = frame[1]
+                    typeid = struct_type._fields[frame[3]][1]
+                    go_type = struct_type._loader.types[typeid]
+                    break
+                pop()
+                value = _finish_struct(frame)
+            elif kind == MAP:
+                if frame[6] is _NOTHING:
+                    frame[6] = value
+                    go_type = frame[5]
+                    break
+                frame[2][frame[6]] = value
+                frame[6] = _NOTHING
+                frame[3] -= 1
+                if frame[3]:
+                    go_type = frame[4]
+                    break
+                pop()
+                value = frame[2]
+            else:
+                result = frame[2]
+                index = frame[3]
+                result[index] = value
+                frame[3] = index + 1
+                if index + 1 < len(result):
+                    go_type = frame[4]
+                    break
+                pop()
+                value = result if kind == SLICE else tuple(result)
+        else:
+            return value, pos
+
+
+def skip_at(go_type, buf, pos, kind=None):
+    """Skip over a value of go_type in buf at position pos without
+    building it. Returns the position after the value.
+
+    Only counts, field deltas and scalars are read. Struct frames on
+    the stack hold the type and the current field. Other frames hold
+    the key and element types, the element type twice for slices and
+    arrays, and the number of keys and elements left. kind overrides
+    the kind of go_type, for types which decode themselves but have
+    the layout of another kind.
+    """
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    if kind is None:
+        kind = go_type.kind
+    while True:
+        # Start skipping a value of go_type.
+        if kind == SCALAR:
+            pos = go_type.skip_at(buf, pos)
+        elif kind == STRUCT:
+            push([STRUCT, go_type, -1])
+        elif kind == SLICE or kind == ARRAY:
+            count, pos = _uint_at(buf, pos)
+            if count:
+                elem = go_type._loader.types[go_type._elem]
+                if elem.kind == SCALAR:
+                    skip = elem.skip_at
+                    for i in range(count):
+                        pos = skip(buf, pos)
+                else:
+                    push([kind, elem, elem, count])
+                    go_type = elem
+                    kind = elem.kind
+                    continue
+        elif kind == MAP:
+            count, pos = _uint_at(buf, pos)
+            if count:
+                types = go_type._loader.types
+                key_type = types[go_type._key_typeid]
+                push([MAP, key_type, types[go_type._elem_typeid], 2 * count])
+                go_type = key_type
+                kind = key_type.kind
+                continue
+        else:
+            # Types of unknown kind can only be decoded.
+            pos = decode_at(go_type, buf, pos)[1]
+
+        # Move on to the next value of the innermost container,
+        # finishing the containers which are then complete.
+        while stack:
+            frame = stack[-1]
+            if frame[0] == STRUCT:
+                delta, pos = _uint_at(buf, pos)
+                if delta:
+                    frame[2] += delta
+                    struct_type = frame[1]
+                    typeid = struct_type._fields[frame[2]][1]
+                    go_type = struct_type._loader.types[typeid]
+                    break
+                pop()
+            else:
+                frame[3] -= 1
+                if frame[3]:
+                    # Map keys are followed by their elements.
+                    go_type = frame[1] if frame[3] % 2 == 0 else frame[2]
+                    break
+                pop()
+        else:
+            return pos
+        kind = go_type.kind
@@ -0,0 +1,129 @@
+"""Optional instrumentation of loaders and dumpers.
+
+A `Stats` object passed to a `Loader` or `Dumper` collects counters
+about the values and types flowing through it. The instrumented
+methods are only installed on instances created with a `Stats`
+object, so there is no overhead when instrumentation is disabled.
+Segment sizes, and the values decoded by `Loader.load_columns` and
+the transcoder, which bypass these methods, are recorded directly
+where a loader with a `Stats` object reads them.
+"""
+
+import time
+import threading
+import collections
+
+from .types import GoInt, GoUint
+
+
+class Stats:
+    """Counters collected by an instrumented `Loader` or `Dumper`.
+
+    Values are counted per top-level type ID: the number of values,
+    the number of bytes in their segments and the cumulative time
+    spent decoding or encoding them. Registered custom types and a
+    histogram of segment sizes are recorded as well.
+
+    Byte counts are the same whether a stream is loaded or dumped.
+    The bytes of a value are those of its segment after the type ID;
+    segment sizes include the type ID. Neither includes the length
+    prefix of the segment.
+
+    The counters may be updated from several threads, such as when a
+    `TypeSnapshot` decodes in a thread pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = collections.Counter()
+        self.bytes = collections.Counter()
+        self.seconds = collections.defaultdict(float)
+        self.types = []
+        self.segment_sizes = collections.Counter()
+
+    def record_value(self, typeid, nbytes, seconds):
+        with self._lock:
+            self.values[typeid] += 1
+            self.bytes[typeid] += nbytes
+            self.seconds[typeid] += seconds
+
+    def record_type(self, typeid, go_type):
+        with self._lock:
+            self.types.append((typeid, repr(go_type)))
+
+    def record_segment(self, size):
+        """Count a segment in the histogram bucket of the smallest power
+        of two strictly larger than the size:
+
+        >>> stats = Stats()
+        >>> for size in [0, 1, 2, 3, 100]:
+        ...     stats.record_segment(size)
+        >>> sorted(stats.segment_sizes.items())
+        [(1, 1), (2, 1), (4, 2), (128, 1)]
+        """
+        with self._lock:
+            self.segment_sizes[1 << size.bit_length()] += 1
+
+    def snapshot(self):
+        """Return a copy of the counters as plain dicts and lists."""
+        values = {}
+        for typeid in sorted(self.values):
+            values[typeid] = {
+                'count': self.values[typeid],
+                'bytes': self.bytes[typeid],
+                'seconds': self.seconds[typeid],
+            }
+        return {
+            'values': values,
+            'types': list(self.types),
+            'segment_sizes': dict(sorted(self.segment_sizes.items())),
+        }
+
+
+def instrument_loader(loader, stats):
+    """Install instrumented segment methods on a `Loader` instance.
+
+    Segment sizes are recorded by the loader itself on each path
+    which reads segments.
+    """
+    register_type = loader._register_type
+    decode_segment = loader._decode_segment
+
+    def _register_type(typeid, segment):
+        go_type = register_type(typeid, segment)
+        stats.record_type(typeid, go_type)
+        return go_type
+
+    def _decode_segment(typeid, segment):
+        start = time.perf_counter()
+        value = decode_segment(typeid, segment)
+        stats.record_value(typeid, len(segment), time.perf_counter() - start)
+        return value
+
+    loader._register_type = _register_type
+    loader._decode_segment = _decode_segment
+
+
+def instrument_dumper(dumper, stats):
+    """Install instrumented encoding methods on a `Dumper` instance."""
+    define = dumper._define
+    encode_segment = dumper._encode_segment
+
+    def _define(go_type):
+        encoded = define(go_type)
+        stats.record_type(go_type.typeid, go_type)
+        stats.record_segment(len(encoded) - GoUint.skip_at(encoded, 0))
+        return encoded
+
+    def _encode_segment(go_type, value):
+        start = time.perf_counter()
+        encoded = encode_segment(go_type, value)
+        seconds = time.perf_counter() - start
+        pos = GoUint.skip_at(encoded, 0)
+        body = GoInt.skip_at(encoded, pos)
+        stats.record_value(go_type.typeid, len(encoded) - body, seconds)
+        stats.record_segment(len(encoded) - pos)
+        return encoded
+
+    dumper._define = _define
+    dumper._encode_segment = _encode_segment
@@ -1,12 +1,34 @@
-from .types import (BOOL, INT, UINT, FLOAT, BYTE_SLICE, STRING, COMPLEX,
+import array
+import inspect
+import time
+
+from .engine import fast_decoder
+from .instrument import instrument_loader
+from .types import (INT, UINT, FLOAT, STRING,
                     WIRE_TYPE, ARRAY_TYPE, COMMON_TYPE, SLICE_TYPE,
                     STRUCT_TYPE, FIELD_TYPE, FIELD_TYPE_SLICE, MAP_TYPE)
-from .types import (GoBool, GoUint, GoInt, GoFloat, GoByteSlice, GoString,
-                    GoComplex, GoStruct, GoWireType, GoSlice)
+from .types import (GoType, GoBool, GoUint, GoInt, GoFloat, GoByteSlice,
+                    GoString, GoComplex, GoStruct, GoWireType, GoSlice)
+
+# Marks the fields a predicate needs which were not found in a struct.
+_MISSING = object()
+
+# Array type codes used by load_columns for numeric struct fields.
+COLUMN_TYPECODES = {
+    INT: 'q',
+    UINT: 'Q',
+    FLOAT: 'd',
+}
 
 
 class Loader:
-    def __init__(self):
+    def __init__(self, stats=None, type_cache=None, schema=None, memo=None):
+        self._type_cache = type_cache
+        self._stats = stats
+        # Structs waiting to be matched against compiled types.
+        self._schema = schema
+        self._unmatched = []
+
         # Compound types that depend on the basic types above.
         common_type = GoStruct(COMMON_TYPE, 'CommonType', self, [
             ('Name', STRING),
@@ -42,64 +64,397 @@ class Loader:
             ('MapT', MAP_TYPE),
         ])
 
-        # We can now register basic and compound types.
-        self.types = {
-            INT: GoInt,
-            UINT: GoUint,
-            BOOL: GoBool,
-            FLOAT: GoFloat,
-            BYTE_SLICE: GoByteSlice,
-            STRING: GoString,
-            COMPLEX: GoComplex,
-            WIRE_TYPE: wire_type,
-            ARRAY_TYPE: array_type,
-            COMMON_TYPE: common_type,
-            SLICE_TYPE: slice_type,
-            STRUCT_TYPE: struct_type,
-            FIELD_TYPE: field_type,
-            FIELD_TYPE_SLICE: field_type_slice,
-            MAP_TYPE: map_type,
-        }
+        # We can now register basic and compound types. Type IDs are
+        # small integers, so the types are kept in a list indexed by
+        # type ID with None for the IDs not in use.
+        self.types = []
+        for go_type in [GoBool, GoInt, GoUint, GoFloat, GoByteSlice, GoString,
+                        GoComplex, wire_type, array_type, common_type,
+                        slice_type, struct_type, field_type,
+                        field_type_slice, map_type]:
+            self.add_type(go_type.typeid, go_type)
+
+        # The memo and instrumentation wrap the methods on this
+        # instance only, the plain methods are used without them.
+        if memo is not None:
+            memo.install(self)
+        if stats is not None:
+            instrument_loader(self, stats)
 
     def load(self, buf):
         value, buf = self._load(buf)
         return value
 
-    def load_all(self, buf):
+    def add_type(self, typeid, go_type):
+        """Register go_type under typeid, growing the type table as
+        needed."""
+        types = self.types
+        if typeid >= len(types):
+            types.extend([None] * (typeid + 1 - len(types)))
+        types[typeid] = go_type
+
+    def get_type(self, typeid):
+        """Return the type registered under typeid or None."""
+        if 0 <= typeid < len(self.types):
+            return self.types[typeid]
+        return None
+
+    def load_types(self, buf):
+        """Register the type definitions at the start of buf and return
+        the rest of the buffer."""
+        while buf:
+            segment, rest = self._read_segment(buf)
+            typeid, pos = GoInt.decode_at(segment, 0)
+            if typeid > 0:
+                break
+            if self._stats is not None:
+                self._stats.record_segment(len(segment))
+            self._register_type(-typeid, segment[pos:])
+            buf = rest
+        return buf
+
+    def freeze(self):
+        """Return an immutable snapshot of the types registered so far."""
+        return TypeSnapshot(self.types, self._stats)
+
+    def load_all(self, buf, where=None):
+        """Decode all gobs in buf.
+
+        With where, only top-level structs matching the predicate are
+        decoded, see `_filter`. Other values are skipped.
+        """
+        # Segments are sliced from a memoryview so that the rest of
+        # the buffer is not copied for every segment.
+        buf = memoryview(buf)
+        if where is not None:
+            yield from self._filter(buf, where)
+            return
         while buf:
             value, buf = self._load(buf)
             yield value
         assert buf == b'', 'trailing data in buffer: %s' % list(buf)
 
+    def _filter(self, buf, where):
+        """Decode the structs in buf which match where.
+
+        The predicate is either a dict mapping field names to values,
+        all of which must be equal to the fields, or a callable whose
+        parameters are named after the fields it needs:
+
+        >>> import pygob, collections
+        >>> Order = collections.namedtuple('Order', ['Kind', 'Size'])
+        >>> dumper = pygob.Dumper()
+        >>> buf = b''.join(dumper.dump(Order(kind, size)) for (kind, size)
+        ...                in [('buy', 10), ('sell', 20), ('buy', 30)])
+        >>> list(Loader().load_all(buf, where={'Kind': b'sell'}))
+        [Order(Kind=b'sell', Size=20)]
+        >>> list(Loader().load_all(buf, where=lambda Size: Size > 15))
+        [Order(Kind=b'sell', Size=20), Order(Kind=b'buy', Size=30)]
+
+        Only the fields up to the last one named by the predicate are
+        looked at, and only the named fields are decoded. The rest of
+        a segment is skipped unless the predicate matches. Values
+        which are not structs or lack a named field never match.
+        """
+        if callable(where):
+            names = tuple(inspect.signature(where).parameters)
+            test = where
+        else:
+            names = tuple(where)
+            expected = tuple(where.values())
+
+            def test(*values):
+                return values == expected
+
+        plans = {}
+        stats = self._stats
+        while buf:
+            segment, buf = self._read_segment(buf)
+            if stats is not None:
+                stats.record_segment(len(segment))
+            typeid, pos = GoInt.decode_at(segment, 0)
+            if typeid < 0:
+                self._register_type(-typeid, segment[pos:])
+                continue
+            if typeid not in plans:
+                plans[typeid] = self._filter_plan(typeid, names)
+            plan = plans[typeid]
+            if plan is not None and test(*self._filter_fields(
+                    plan, segment, pos)):
+                yield self._decode_segment(typeid, segment[pos:])
+
+    def _filter_plan(self, typeid, names):
+        """Return the slot of each field named in names, by field index,
+        and the struct type, or None if the type lacks some fields."""
+        go_type = self.get_type(typeid)
+        if not isinstance(go_type, GoStruct):
+            return None
+        field_ids = {name: i for i, (name, t) in enumerate(go_type._fields)}
+        if not all(name in field_ids for name in names):
+            return None
+        return {field_ids[name]: slot for slot, name in enumerate(names)}, \
+            go_type
+
+    def _filter_fields(self, plan, segment, pos):
+        """Decode the fields needed by a predicate from a struct."""
+        slots, go_type = plan
+        fields = go_type._fields
+        types = self.types
+        values = [_MISSING] * len(slots)
+        remaining = len(slots)
+        field_id = -1
+        while remaining:
+            delta, pos = GoUint.decode_at(segment, pos)
+            if delta == 0:
+                break
+            field_id += delta
+            field_type = types[fields[field_id][1]]
+            slot = slots.get(field_id)
+            if slot is None:
+                pos = field_type.skip_at(segment, pos)
+            else:
+                values[slot], pos = field_type.decode_at(segment, pos)
+                remaining -= 1
+        # Fields left out of the stream have the zero value they have
+        # in the struct, which is None for fields referring back to it.
+        if remaining:
+            template, fresh = go_type._zero_values()
+            factories = dict(fresh)
+            for field_id, slot in slots.items():
+                if values[slot] is _MISSING:
+                    factory = factories.get(field_id)
+                    values[slot] = (template[field_id] if factory is None
+                                    else factory())
+        return values
+
     def _read_segment(self, buf):
         length, buf = GoUint.decode(buf)
         return buf[:length], buf[length:]
 
+    def load_columns(self, buf):
+        """Decode a stream of structs of a single type into columns.
+
+        Returns a dict mapping each field name to a column with one
+        entry per struct in the stream. Integer and float fields are
+        collected in compact `array.array` objects, all other fields
+        in lists. No namedtuple is created for the individual values,
+        and the result can be passed directly to, say,
+        `pandas.DataFrame`.
+        """
+        go_type = None
+        columns = {}
+        # Segments are sliced from a memoryview and rows are decoded
+        # in place, so that no bytes are copied per row.
+        buf = memoryview(buf)
+        stats = self._stats
+        while buf:
+            segment, buf = self._read_segment(buf)
+            if stats is not None:
+                stats.record_segment(len(segment))
+            typeid, pos = GoInt.decode_at(segment, 0)
+            if typeid < 0:
+                self._register_type(-typeid, segment[pos:])
+                continue
+
+            if go_type is None:
+                go_type = self.get_type(typeid)
+                if not isinstance(go_type, GoStruct):
+                    raise ValueError('cannot decode columns of %s' % go_type)
+                columns, decode_row = self._column_decoder(go_type)
+            elif typeid != go_type.typeid:
+                raise ValueError('expected values of type %d, found %d' %
+                                 (go_type.typeid, typeid))
+
+            if stats is None:
+                pos = decode_row(segment, pos)
+            else:
+                start = time.perf_counter()
+                end = decode_row(segment, pos)
+                stats.record_value(typeid, len(segment) - pos,
+                                   time.perf_counter() - start)
+                pos = end
+            assert pos == len(segment), ('trailing data in segment: %s' %
+                                         list(segment[pos:]))
+        return columns
+
+    def _column_decoder(self, go_type):
+        """Prepare columns for go_type and a function which decodes a
+        struct at a position and appends its fields to the columns."""
+        columns = {}
+        appends = []
+        decoders = []
+        for name, typeid in go_type._fields:
+            typecode = COLUMN_TYPECODES.get(typeid)
+            column = array.array(typecode) if typecode else []
+            columns[name] = column
+            appends.append(column.append)
+            decoders.append(self.types[typeid].decode_at)
+        # Fields left out of the stream have the zero value they have
+        # in the struct, which is None for fields referring back to it.
+        template, fresh = go_type._zero_values()
+        factories = dict(fresh)
+
+        def append_zero(field_id):
+            factory = factories.get(field_id)
+            appends[field_id](template[field_id] if factory is None
+                              else factory())
+
+        def decode_row(buf, pos):
+            field_id = -1
+            while True:
+                delta, pos = GoUint.decode_at(buf, pos)
+                if delta == 0:
+                    break
+                for skipped in range(field_id + 1, field_id + delta):
+                    append_zero(skipped)
+                field_id += delta
+                value, pos = decoders[field_id](buf, pos)
+                appends[field_id](value)
+            for skipped in range(field_id + 1, len(appends)):
+                append_zero(skipped)
+            return pos
+
+        return columns, decode_row
+
+    def _register_type(self, typeid, segment):
+        cache = self._type_cache
+        custom_type = None
+        if cache is not None:
+            custom_type = cache.get(typeid, segment, self)
+
+        if custom_type is None:
+            # Decode wire type and register type for later.
+            custom_type, rest = self.decode_value(WIRE_TYPE, segment)
+            assert rest == b'', 'trailing data in segment: %s' % list(rest)
+            if cache is not None:
+                cache.add(typeid, segment, custom_type)
+        self.add_type(typeid, custom_type)
+        if self._schema is not None:
+            self._match_schema(typeid)
+        return custom_type
+
+    def _match_schema(self, typeid):
+        """Replace structs by their compiled versions from the schema.
+
+        Go sends the definition of a struct before the definitions of
+        its field types, so a struct is matched once all the types it
+        refers to are known.
+        """
+        self._unmatched.append(typeid)
+        unmatched = []
+        for typeid in self._unmatched:
+            try:
+                compiled = self._schema.match(self.types[typeid])
+            except LookupError:
+                unmatched.append(typeid)
+                continue
+            if compiled is not None:
+                self.add_type(typeid, compiled)
+        self._unmatched = unmatched
+
     def _load(self, buf):
         while True:
             segment, buf = self._read_segment(buf)
-            typeid, segment = GoInt.decode(segment)
+            typeid, value = self._load_segment(segment)
             if typeid > 0:
-                break  # Found a value.
+                return value, buf
 
-            # Decode wire type and register type for later.
-            custom_type, segment = self.decode_value(WIRE_TYPE, segment)
-            self.types[-typeid] = custom_type
-            assert segment == b'', ('trailing data in segment: %s' %
-                                    list(segment))
+    def _load_segment(self, segment):
+        """Load a single segment and return its type ID and value.
+
+        Type definitions are registered and returned with a negative
+        type ID, their value is the newly defined type.
+        """
+        if self._stats is not None:
+            self._stats.record_segment(len(segment))
+        typeid, segment = GoInt.decode(segment)
+        if typeid < 0:
+            return typeid, self._register_type(-typeid, segment)
+        return typeid, self._decode_segment(typeid, segment)
 
+    def _decode_segment(self, typeid, segment):
         # Top-level singletons are sent with an extra zero byte which
         # serves as a kind of field delta.
-        go_type = self.types.get(typeid)
-        if go_type is not None and not isinstance(go_type, GoStruct):
-            assert segment[0] == 0, 'illegal delta for singleton: %s' % buf[0]
-            segment = segment[1:]
-        value, segment = self.decode_value(typeid, segment)
-        assert segment == b'', 'trailing data in segment: %s' % list(segment)
-        return value, buf
+        types = self.types
+        go_type = types[typeid] if typeid < len(types) else None
+        if go_type is None:
+            raise NotImplementedError("cannot decode %s" % typeid)
+        pos = 0
+        if not isinstance(go_type, GoStruct):
+            assert segment[0] == 0, ('illegal delta for singleton: %s' %
+                                     segment[0])
+            pos = 1
+        value, pos = go_type.decode_at(segment, pos)
+        assert pos == len(segment), ('trailing data in segment: %s' %
+                                     list(segment[pos:]))
+        return value
 
     def decode_value(self, typeid, buf):
-        go_type = self.types.get(typeid)
+        go_type = self.get_type(typeid)
         if go_type is None:
             raise NotImplementedError("cannot decode %s" % typeid)
         return go_type.decode(buf)
+
+
+class TypeSnapshot(Loader):
+    """An immutable table of types.
+
+    A snapshot decodes values like the loader it was taken from, but
+    cannot learn new types. Nothing is modified while decoding, so a
+    snapshot can be shared freely between threads:
+
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> from pygob import Framer
+    >>> data = bytes([3, 4, 0, 2, 3, 4, 0, 4, 4, 12, 0, 1, 33])
+    >>> segments = list(Framer().feed(data))
+    >>> with ThreadPoolExecutor() as executor:
+    ...     list(Loader().freeze().decode_messages(segments, executor))
+    [1, 2, b'!']
+    """
+
+    def __init__(self, types, stats=None):
+        self._type_cache = None
+        self._schema = None
+        self._stats = stats
+        # Custom types are copied so that they look up other types
+        # here and not in the original loader.
+        self.types = tuple(go_type.bind(self)
+                           if isinstance(go_type, GoType) else go_type
+                           for go_type in types)
+
+        # Zero values and fast decoders are memoized when first
+        # needed. Compute them up front so that decoding never writes
+        # to the types.
+        for go_type in self.types:
+            if go_type is None:
+                continue
+            try:
+                go_type._zero_parts()
+                fast_decoder(go_type)
+            except (LookupError, AttributeError):
+                pass  # refers to a type which has not been defined
+
+        if stats is not None:
+            instrument_loader(self, stats)
+
+    def freeze(self):
+        return self
+
+    def decode_messages(self, segments, executor=None):
+        """Decode value segments, such as those returned by a `Framer`.
+
+        With an executor, such as a `ThreadPoolExecutor`, the segments
+        are decoded concurrently. The values are returned in the
+        order of the segments in either case.
+        """
+        if executor is None:
+            return map(self.decode_message, segments)
+        return executor.map(self.decode_message, segments)
+
+    def decode_message(self, segment):
+        """Decode a single value segment."""
+        typeid, value = self._load_segment(segment)
+        return value
+
+    def _register_type(self, typeid, segment):
+        raise ValueError('cannot define type %d in a snapshot' % typeid)
@@ -0,0 +1,262 @@
+"""Routing of gob messages without decoding their values.
+
+A `MessageReader` splits a gob stream into value messages, each a
+type ID and the raw bytes of its segment. Only the type definitions
+are decoded, to learn which types each type depends on. A
+`MessageWriter` copies messages to another stream verbatim and sends
+the definitions a message needs the first time they are needed:
+
+>>> import io, pygob
+>>> from pygob.types import STRING
+>>> dumper = pygob.Dumper()
+>>> data = dumper.dump([1, 2]) + dumper.dump('text') + dumper.dump([3])
+>>> reader = MessageReader()
+>>> out = io.BytesIO()
+>>> writer = MessageWriter(out, reader)
+>>> for message in reader.feed(data):
+...     if message.typeid != STRING:
+...         writer.write(message)
+>>> list(pygob.load_all(out.getvalue()))
+[[1, 2], [3]]
+"""
+
+import collections
+
+from .decoder import Framer
+from .dumper import Dumper
+from .loader import Loader
+from .schema import signature
+from .stream import CHUNK_SIZE, read_chunks
+from .types import (GoInt, GoUint, GoStruct, GoSlice, GoArray, GoMap,
+                    INTERFACE, FIRST_CUSTOM_TYPE, dependencies)
+
+# A value segment, without its length prefix, and its type ID.
+Message = collections.namedtuple('Message', 'typeid segment')
+
+
+class MessageReader:
+    """Split a gob stream fed in chunks into value messages.
+
+    Type definitions are recorded with the raw bytes they were sent
+    with, so that they can be copied to other streams.
+    """
+
+    def __init__(self):
+        self._loader = Loader()
+        self._framer = Framer()
+        # Type ID -> (segment, direct dependencies) in stream order.
+        self._definitions = collections.OrderedDict()
+        self._closures = {}
+
+    def feed(self, data):
+        """Add data to the stream and return an iterator over the value
+        messages completed so far."""
+        return self._messages(self._framer.feed(data))
+
+    def close(self):
+        """Signal the end of the stream."""
+        self._framer.close()
+
+    def read(self, fp, compression='auto', chunk_size=CHUNK_SIZE):
+        """Read all value messages from a binary file object."""
+        for chunk in read_chunks(fp, compression, chunk_size):
+            yield from self.feed(chunk)
+        self.close()
+
+    def _messages(self, segments):
+        for segment in segments:
+            typeid, pos = GoInt.decode_at(segment, 0)
+            if typeid < 0:
+                go_type = self._loader._register_type(-typeid, segment[pos:])
+                self._definitions[-typeid] = (segment,
+                                              dependencies(go_type))
+            else:
+                yield Message(typeid, segment)
+
+    def name(self, typeid):
+        """Return the name of a struct type or None."""
+        go_type = self._loader.get_type(typeid)
+        return getattr(go_type, '_name', None)
+
+    def definition(self, typeid):
+        """Return the raw definition segment of a custom type."""
+        return self._definitions[typeid][0]
+
+    def dependencies(self, typeid):
+        """Return the custom types needed to decode values of typeid,
+        including typeid itself, in the order they were defined."""
+        closure = self._closures.get(typeid)
+        if closure is None:
+            closure = self._closures[typeid] = self._closure(typeid)
+        return closure
+
+    def _closure(self, typeid):
+        needed = set()
+        stack = [typeid]
+        while stack:
+            typeid = stack.pop()
+            if typeid < FIRST_CUSTOM_TYPE or typeid in needed:
+                continue
+            if typeid not in self._definitions:
+                raise ValueError('type %d is not defined' % typeid)
+            needed.add(typeid)
+            stack.extend(self._definitions[typeid][1])
+        return [typeid for typeid in self._definitions if typeid in needed]
+
+
+class MessageWriter:
+    """Write messages from a `MessageReader` to a binary file object.
+
+    The definitions of the types of a message are written before the
+    first message which needs them and never again.
+    """
+
+    def __init__(self, fp, reader):
+        self._fp = fp
+        self._reader = reader
+        self._sent = set()
+        # Types whose definitions have all been written.
+        self._ready = set()
+
+    def write(self, message):
+        typeid = message.typeid
+        if typeid not in self._ready:
+            for needed in self._reader.dependencies(typeid):
+                if needed not in self._sent:
+                    self._write_segment(self._reader.definition(needed))
+                    self._sent.add(needed)
+            self._ready.add(typeid)
+        self._write_segment(message.segment)
+
+    def _write_segment(self, segment):
+        self._fp.write(GoUint.encode(len(segment)))
+        self._fp.write(segment)
+
+
+def route(src, outputs, default=None, compression='auto',
+          chunk_size=CHUNK_SIZE):
+    """Split the gob stream in src by the names of the struct types.
+
+    outputs maps type names to binary file objects. Values of other
+    types are written to default, or dropped if it is None. Returns
+    the number of messages written to each output name.
+    """
+    reader = MessageReader()
+    writers = {name: MessageWriter(fp, reader)
+               for name, fp in outputs.items()}
+    default_writer = None if default is None else MessageWriter(default,
+                                                                reader)
+    counts = collections.Counter()
+    for message in reader.read(src, compression, chunk_size):
+        name = reader.name(message.typeid)
+        writer = writers.get(name, default_writer)
+        if writer is not None:
+            writer.write(message)
+            counts[name if name in writers else None] += 1
+    return counts
+
+
+def _remap(go_type, typeid, mapping, loader):
+    """Return a copy of go_type with new type IDs."""
+    if isinstance(go_type, GoStruct):
+        fields = [(name, mapping.get(t, t)) for (name, t) in go_type._fields]
+        return GoStruct(typeid, go_type._name, loader, fields)
+    if isinstance(go_type, GoSlice):
+        return GoSlice(typeid, loader, mapping.get(go_type._elem,
+                                                   go_type._elem))
+    if isinstance(go_type, GoArray):
+        return GoArray(typeid, loader, mapping.get(go_type._elem,
+                                                   go_type._elem),
+                       go_type._length)
+    return GoMap(typeid, loader,
+                 mapping.get(go_type._key_typeid, go_type._key_typeid),
+                 mapping.get(go_type._elem_typeid, go_type._elem_typeid))
+
+
+class _Merger:
+    """Assign type IDs in a merged stream.
+
+    Types from different inputs with the same structure, including
+    the names of structs and fields, share a single type ID.
+    """
+
+    def __init__(self, output):
+        self._output = output
+        self._dumper = Dumper()
+        self._typeids = {}
+        self.count = 0
+
+    def copy(self, src, compression, chunk_size):
+        reader = MessageReader()
+        # Type IDs in src -> type IDs in the output.
+        mapping = {}
+        for message in reader.read(src, compression, chunk_size):
+            typeid = mapping.get(message.typeid)
+            if typeid is None:
+                typeid = self._map(reader, message.typeid, mapping)
+            pos = GoInt.skip_at(message.segment, 0)
+            self._write_segment(GoInt.encode(typeid) +
+                                message.segment[pos:])
+            self.count += 1
+
+    def _map(self, reader, typeid, mapping):
+        if typeid < FIRST_CUSTOM_TYPE:
+            mapping[typeid] = typeid
+            return typeid
+        loader = reader._loader
+        needed = [t for t in reader.dependencies(typeid) if t not in mapping]
+        for t in needed:
+            go_type = loader.get_type(t)
+            if INTERFACE in dependencies(go_type):
+                raise NotImplementedError('cannot merge interface values')
+            key = signature(go_type)
+            if key not in self._typeids:
+                self._typeids[key] = None  # defined below
+            mapping[t] = key
+        # All IDs are assigned before the definitions are encoded, as
+        # types may refer to each other.
+        new = []
+        for t in needed:
+            key = mapping[t]
+            if self._typeids[key] is None:
+                self._typeids[key] = self._dumper._next_typeid() + len(new)
+                new.append(t)
+            mapping[t] = self._typeids[key]
+        for t in new:
+            go_type = _remap(loader.get_type(t), mapping[t], mapping,
+                             self._dumper._loader)
+            self._dumper._add_custom(go_type)
+            self._output.write(self._dumper._define(go_type))
+        return mapping[typeid]
+
+    def _write_segment(self, segment):
+        self._output.write(GoUint.encode(len(segment)))
+        self._output.write(segment)
+
+
+def merge(inputs, output, compression='auto', chunk_size=CHUNK_SIZE):
+    """Concatenate gob streams into a single valid stream.
+
+    Type IDs are only meaningful within the stream which defined them,
+    so plain concatenation of streams from different encoders gives
+    conflicting definitions. Here the custom types of all inputs get
+    new IDs in the output, and identical types are defined only once:
+
+    >>> import io, pygob
+    >>> first, second = pygob.Dumper(), pygob.Dumper()
+    >>> inputs = [io.BytesIO(first.dump([1]) + first.dump({'a': 1.5})),
+    ...           io.BytesIO(second.dump({'b': 2.5}) + second.dump([2]))]
+    >>> out = io.BytesIO()
+    >>> merge(inputs, out)
+    4
+    >>> list(pygob.load_all(out.getvalue()))
+    [[1], {b'a': 1.5}, {b'b': 2.5}, [2]]
+
+    The inputs are binary file objects, read one after the other in
+    chunks. Values are copied without being decoded. Returns the
+    number of values written.
+    """
+    merger = _Merger(output)
+    for src in inputs:
+        merger.copy(src, compression, chunk_size)
+    return merger.count
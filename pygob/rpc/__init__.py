@@ -0,0 +1,28 @@
+"""Clients and server for Go's net/rpc protocol.
+
+Go's net/rpc package uses gob as its wire format. The clients here
+can call Go services and the server can be called by Go clients:
+
+    >>> import collections
+    >>> Args = collections.namedtuple('Args', ['A', 'B'])
+    >>> class Arith:
+    ...     def Multiply(self, args):
+    ...         return args.A * args.B
+    >>> server = Server()
+    >>> server.register(Arith())
+    >>> address = server.listen()
+    >>> with Client.connect(address) as client:
+    ...     client.call('Arith.Multiply', Args(7, 8))
+    56
+    >>> server.close()
+
+The `AsyncClient` for asyncio needs Python 3.5 or later.
+"""
+
+import sys
+
+from .codec import ServerError, ShutdownError  # noqa: F401
+from .client import Client, ClientPool  # noqa: F401
+from .server import Server  # noqa: F401
+if sys.version_info >= (3, 5):
+    from .aio import AsyncClient  # noqa: F401
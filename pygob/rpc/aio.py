@@ -0,0 +1,85 @@
+"""An asyncio net/rpc client.
+
+This module uses async def and needs Python 3.5 or later.
+"""
+
+import asyncio
+
+from .codec import Encoder, Messages, Request, ServerError, ShutdownError
+from .codec import RECV_SIZE
+
+
+class AsyncClient:
+    """A net/rpc client on a single asyncio connection.
+
+    Any number of calls can be awaited concurrently, they are matched
+    to their responses by sequence number.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._encoder = Encoder()
+        self._seq = 0
+        self._pending = {}
+        self._closed = False
+        self._task = asyncio.ensure_future(self._read_responses())
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, service_method, args):
+        """Call a remote method and return its reply."""
+        if self._closed:
+            raise ShutdownError()
+        self._seq += 1
+        seq = self._seq
+        data = self._encoder.encode(Request(service_method, seq), args)
+        future = asyncio.Future()
+        self._pending[seq] = future
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+        except BaseException:
+            self._pending.pop(seq, None)
+            raise
+        return await future
+
+    async def close(self):
+        """Close the connection, failing all pending calls."""
+        self._closed = True
+        self._writer.close()
+        await self._task
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _read_responses(self):
+        messages = Messages()
+        try:
+            while True:
+                data = await self._reader.read(RECV_SIZE)
+                if not data:
+                    break
+                for header, body in messages.feed(data):
+                    future = self._pending.pop(header.Seq, None)
+                    if future is None or future.done():
+                        continue
+                    if header.Error:
+                        error = header.Error.decode('utf-8', 'replace')
+                        future.set_exception(ServerError(error))
+                    else:
+                        future.set_result(body)
+        except OSError:
+            pass
+        finally:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ShutdownError())
@@ -0,0 +1,149 @@
+"""Threaded net/rpc clients."""
+
+import socket
+import threading
+from concurrent.futures import Future
+
+from .codec import Connection, Request, ServerError, ShutdownError
+
+
+class Client:
+    """A net/rpc client on a single connection.
+
+    Any number of calls can be in flight at the same time. A
+    background thread reads the responses and matches them to the
+    calls by their sequence number.
+    """
+
+    def __init__(self, sock):
+        self._connection = Connection(sock)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._pending = {}
+        self._closed = False
+        self._reader = threading.Thread(target=self._read_responses,
+                                        daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def connect(cls, address, timeout=None):
+        """Connect to a (host, port) address."""
+        return cls(socket.create_connection(address, timeout))
+
+    @property
+    def pending(self):
+        """Number of calls waiting for a response."""
+        return len(self._pending)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def go(self, service_method, args):
+        """Start a call and return a Future for its reply."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise ShutdownError()
+            self._seq += 1
+            seq = self._seq
+            self._pending[seq] = future
+        try:
+            self._connection.send(Request(service_method, seq), args)
+        except BaseException as exc:
+            # Nothing was sent if the arguments could not be encoded.
+            with self._lock:
+                self._pending.pop(seq, None)
+            if isinstance(exc, OSError):
+                raise ShutdownError() from exc
+            raise
+        return future
+
+    def call(self, service_method, args, timeout=None):
+        """Call a remote method and wait for its reply."""
+        return self.go(service_method, args).result(timeout)
+
+    def close(self):
+        """Close the connection, failing all pending calls."""
+        with self._lock:
+            self._closed = True
+        try:
+            self._connection.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_responses(self):
+        try:
+            for header, body in self._connection.receive():
+                with self._lock:
+                    future = self._pending.pop(header.Seq, None)
+                if future is None:
+                    continue  # Nobody is waiting for this response.
+                if header.Error:
+                    error = header.Error.decode('utf-8', 'replace')
+                    future.set_exception(ServerError(error))
+                else:
+                    future.set_result(body)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._closed = True
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(ShutdownError())
+
+
+class ClientPool:
+    """Connections to any number of endpoints.
+
+    Up to size connections are opened per endpoint. A call uses the
+    connection with the fewest pending calls and opens a new one only
+    when all existing connections are busy.
+    """
+
+    def __init__(self, size=4, timeout=None):
+        self._size = size
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def client(self, address):
+        """Return a client connected to address."""
+        with self._lock:
+            clients = [c for c in self._clients.get(address, [])
+                       if not c.closed]
+            self._clients[address] = clients
+            idle = min(clients, key=lambda c: c.pending, default=None)
+            if idle is not None and (idle.pending == 0
+                                     or len(clients) >= self._size):
+                return idle
+            client = Client.connect(address, self._timeout)
+            clients.append(client)
+            return client
+
+    def go(self, address, service_method, args):
+        return self.client(address).go(service_method, args)
+
+    def call(self, address, service_method, args, timeout=None):
+        return self.go(address, service_method, args).result(timeout)
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for endpoint_clients in clients.values():
+            for client in endpoint_clients:
+                client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,115 @@
+"""The gob codec of Go's net/rpc package.
+
+Every call is sent as a `Request` header followed by the argument
+value, and every reply as a `Response` header followed by the reply
+value. Both directions of a connection are a single gob stream, so
+type definitions are only sent once per connection.
+"""
+
+import collections
+import threading
+
+from ..decoder import Decoder
+from ..dumper import Dumper
+from ..types import STRING, UINT
+
+Request = collections.namedtuple('Request', ['ServiceMethod', 'Seq'])
+Response = collections.namedtuple('Response',
+                                  ['ServiceMethod', 'Seq', 'Error'])
+
+# The body sent by Go servers when a call fails.
+InvalidRequest = collections.namedtuple('invalidRequest', [])
+
+# Number of bytes read from a socket at a time.
+RECV_SIZE = 64 * 1024
+
+
+class ServerError(Exception):
+    """An error returned by the remote method."""
+
+
+class ShutdownError(ConnectionError):
+    """The connection was closed while calls were pending."""
+
+    def __init__(self):
+        super().__init__('connection is shut down')
+
+
+def new_dumper():
+    """Return a dumper with the net/rpc header types registered."""
+    dumper = Dumper()
+    dumper.register(Request, [('ServiceMethod', STRING), ('Seq', UINT)])
+    dumper.register(Response, [('ServiceMethod', STRING), ('Seq', UINT),
+                               ('Error', STRING)])
+    dumper.register(InvalidRequest, [])
+    return dumper
+
+
+class Encoder:
+    """Encode headers and bodies for one direction of a connection."""
+
+    def __init__(self):
+        self._dumper = new_dumper()
+
+    def encode(self, header, body):
+        # The body is encoded first so that nothing is recorded as
+        # sent if it cannot be encoded.
+        body = self._dumper.dump(body)
+        return self._dumper.dump(header) + body
+
+
+class Messages:
+    """Pair up decoded values as (header, body) messages.
+
+    Data is fed in chunks as received from the connection:
+
+    >>> messages = Messages()
+    >>> encoder = Encoder()
+    >>> data = encoder.encode(Request('Arith.Add', 1), 42)
+    >>> list(messages.feed(data[:10]))
+    []
+    >>> list(messages.feed(data[10:]))
+    [(Request(ServiceMethod=b'Arith.Add', Seq=1), 42)]
+    """
+
+    def __init__(self):
+        self._decoder = Decoder()
+        self._header = None
+
+    def feed(self, data):
+        for value in self._decoder.feed(data):
+            if self._header is None:
+                self._header = value
+            else:
+                header, self._header = self._header, None
+                yield header, value
+
+
+class Connection:
+    """A socket speaking the codec in both directions.
+
+    Writes are serialized by a lock so that several threads can send
+    messages on the same connection.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._encoder = Encoder()
+        self._lock = threading.Lock()
+
+    def send(self, header, body):
+        with self._lock:
+            self.sock.sendall(self._encoder.encode(header, body))
+
+    def receive(self):
+        """Iterate over (header, body) messages until the peer closes the
+        connection."""
+        messages = Messages()
+        while True:
+            data = self.sock.recv(RECV_SIZE)
+            if not data:
+                return
+            yield from messages.feed(data)
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,128 @@
+"""A threaded net/rpc server."""
+
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .codec import Connection, Response, InvalidRequest
+
+
+class Server:
+    """Serve the methods of registered objects.
+
+    A method is called with the decoded argument and returns the
+    reply. Exceptions are sent back as errors. Calls are run in a
+    thread pool, so calls pipelined on one connection run
+    concurrently and may complete in any order.
+    """
+
+    def __init__(self, max_workers=None):
+        self._services = {}
+        if max_workers is None:
+            # The default of ThreadPoolExecutor since Python 3.5.
+            max_workers = (os.cpu_count() or 1) * 5
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._listener = None
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def register(self, obj, name=None):
+        """Register the public methods of obj under name, which defaults
+        to the class name of obj."""
+        if name is None:
+            name = type(obj).__name__
+        self._services[name] = obj
+
+    def listen(self, address=('127.0.0.1', 0)):
+        """Accept connections on address in a background thread. Returns
+        the address actually bound."""
+        self._listener = socket.socket()
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(address)
+        self._listener.listen(socket.SOMAXCONN)
+        thread = threading.Thread(target=self._accept, daemon=True)
+        thread.start()
+        return self._listener.getsockname()
+
+    def serve_connection(self, sock):
+        """Serve calls on a connected socket until it is closed."""
+        connection = Connection(sock)
+        with self._lock:
+            self._connections.add(connection)
+        try:
+            for request, args in connection.receive():
+                try:
+                    self._executor.submit(self._call, connection, request,
+                                          args)
+                except RuntimeError:
+                    break  # The server has been closed.
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(connection)
+            connection.close()
+
+    def close(self):
+        """Stop accepting connections and close the open ones."""
+        if self._listener is not None:
+            self._listener.close()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self._listener.accept()
+            except OSError:
+                return
+            thread = threading.Thread(target=self.serve_connection,
+                                      args=(sock, ), daemon=True)
+            thread.start()
+
+    def _lookup(self, service_method):
+        service_method = service_method.decode('utf-8', 'replace')
+        service_name, dot, method_name = service_method.rpartition('.')
+        if not dot:
+            raise LookupError('rpc: service/method request ill-formed: %s' %
+                              service_method)
+        service = self._services.get(service_name)
+        if service is None:
+            raise LookupError("rpc: can't find service %s" % service_method)
+        method = getattr(service, method_name, None)
+        if method_name.startswith('_') or not callable(method):
+            raise LookupError("rpc: can't find method %s" % service_method)
+        return method
+
+    def _call(self, connection, request, args):
+        try:
+            reply = self._lookup(request.ServiceMethod)(args)
+            error = ''
+        except Exception as exc:
+            reply = InvalidRequest()
+            error = str(exc) or type(exc).__name__
+        try:
+            try:
+                connection.send(
+                    Response(request.ServiceMethod, request.Seq, error),
+                    reply)
+            except NotImplementedError as exc:
+                # The reply could not be encoded.
+                connection.send(
+                    Response(request.ServiceMethod, request.Seq, str(exc)),
+                    InvalidRequest())
+        except OSError:
+            pass  # The client went away.
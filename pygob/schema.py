@@ -0,0 +1,628 @@
+"""Ahead-of-time compilation of gob schemas.
+
+The struct types of a program are usually known before any stream is
+read. This module reads them from Go type declarations such as
+
+    type Point struct {
+        X, Y int
+    }
+
+or from the type definitions at the start of a gob stream, and
+generates a Python module with a decoder and an encoder function for
+each struct. The generated module has a `SCHEMA` which is passed to a
+`Loader`:
+
+    loader = pygob.Loader(schema=points.SCHEMA)
+
+The loader still reads the type definitions in the stream, but binds
+each struct whose name and structure match a compiled type to the
+generated functions instead of decoding it field by field.
+
+Generated functions call each other for nested values, so recursive
+structs, and structs containing them, are not compiled. They are left
+to the decoder in `pygob.engine`, which handles any nesting depth.
+"""
+
+import re
+
+from .engine import SCALAR, STRUCT, skip_at
+from .loader import Loader
+from .types import (BOOL, INT, UINT, FLOAT, BYTE_SLICE, STRING, COMPLEX,
+                    FIRST_CUSTOM_TYPE, GoStruct, GoSlice, GoArray, GoMap)
+
+# Type IDs of the predeclared Go types.
+BUILTINS = {
+    'bool': BOOL,
+    'int': INT, 'int8': INT, 'int16': INT, 'int32': INT, 'int64': INT,
+    'rune': INT,
+    'uint': UINT, 'uint8': UINT, 'uint16': UINT, 'uint32': UINT,
+    'uint64': UINT, 'uintptr': UINT, 'byte': UINT,
+    'float32': FLOAT, 'float64': FLOAT,
+    'complex64': COMPLEX, 'complex128': COMPLEX,
+    'string': STRING,
+}
+
+# Names of the scalar decoders and encoders in generated modules and
+# the Python source of their zero values.
+SCALARS = {
+    BOOL: ('GoBool', 'False'),
+    INT: ('GoInt', '0'),
+    UINT: ('GoUint', '0'),
+    FLOAT: ('GoFloat', '0.0'),
+    BYTE_SLICE: ('GoByteSlice', 'bytearray()'),
+    STRING: ('GoString', "b''"),
+    COMPLEX: ('GoComplex', '0j'),
+}
+
+# Zero values which can be shared between decoded values.
+_CONSTANT_ZEROS = {'False', '0', '0.0', "b''", '0j'}
+
+_TOKEN = re.compile(r'''
+    (?P<skip>[ \t\r]+|//[^\n]*|/\*.*?\*/|`[^`]*`|"(?:\\.|[^"\\])*")
+  | (?P<token>\n|;|[][{}()*,]|[A-Za-z_][A-Za-z0-9_.]*|[0-9]+)
+''', re.VERBOSE | re.DOTALL)
+
+
+def _tokenize(text):
+    pos = 0
+    tokens = []
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError('cannot parse Go declarations at %r' %
+                             text[pos:pos + 20])
+        if match.group('token'):
+            token = match.group('token')
+            tokens.append(';' if token == '\n' else token)
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Parse Go type declarations into type expressions.
+
+    Type expressions are tuples: ('name', name), ('ptr', expr),
+    ('slice', expr), ('array', length, expr), ('map', key, elem),
+    ('struct', fields) and ('interface', ). The fields of a struct
+    are (name, expr) pairs.
+    """
+
+    def __init__(self, text):
+        self._tokens = _tokenize(text)
+        self._pos = 0
+
+    def _peek(self):
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        return None
+
+    def _next(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError('unexpected end of Go declarations')
+        self._pos += 1
+        return token
+
+    def _expect(self, expected):
+        token = self._next()
+        if token != expected:
+            raise ValueError('expected %r, found %r' % (expected, token))
+
+    def _skip_separators(self):
+        while self._peek() == ';':
+            self._pos += 1
+
+    def declarations(self):
+        """Return the declared types as a list of (name, expr) pairs."""
+        result = []
+        while True:
+            self._skip_separators()
+            token = self._peek()
+            if token is None:
+                return result
+            self._pos += 1
+            if token == 'package':
+                self._next()
+            elif token == 'import':
+                self._skip_import()
+            elif token == 'type':
+                if self._peek() == '(':
+                    self._pos += 1
+                    self._skip_separators()
+                    while self._peek() != ')':
+                        result.append((self._next(), self._type()))
+                        self._skip_separators()
+                    self._pos += 1
+                else:
+                    result.append((self._next(), self._type()))
+            else:
+                raise ValueError('expected a type declaration, found %r' %
+                                 token)
+
+    def _skip_import(self):
+        if self._next() == '(':
+            while self._next() != ')':
+                pass
+
+    def _type(self):
+        token = self._next()
+        if token == '*':
+            return ('ptr', self._type())
+        if token == '[':
+            if self._peek() == ']':
+                self._pos += 1
+                return ('slice', self._type())
+            length = self._next()
+            if not length.isdigit():
+                raise ValueError('invalid array length %r' % length)
+            self._expect(']')
+            return ('array', int(length), self._type())
+        if token == 'map':
+            self._expect('[')
+            key = self._type()
+            self._expect(']')
+            return ('map', key, self._type())
+        if token == 'struct':
+            return ('struct', self._fields())
+        if token == 'interface':
+            self._expect('{')
+            while self._next() != '}':
+                pass
+            return ('interface', )
+        return ('name', token)
+
+    def _fields(self):
+        self._expect('{')
+        fields = []
+        while True:
+            self._skip_separators()
+            if self._peek() == '}':
+                self._pos += 1
+                return fields
+            if self._peek() == '*':
+                # An embedded pointer type.
+                expr = self._type()
+                fields.append((expr[1][1].split('.')[-1], expr))
+                continue
+            names = [self._next()]
+            while self._peek() == ',':
+                self._pos += 1
+                names.append(self._next())
+            if len(names) == 1 and self._peek() in (';', '}'):
+                # An embedded type, the field is named after it.
+                fields.append((names[0].split('.')[-1], ('name', names[0])))
+                continue
+            expr = self._type()
+            fields.extend((name, expr) for name in names)
+
+
+class _Builder:
+    """Register the types of Go declarations in a loader."""
+
+    def __init__(self, declarations):
+        self.loader = Loader()
+        self._declarations = dict(declarations)
+        self._names = {}
+        self._compound = {}
+        self._next_typeid = FIRST_CUSTOM_TYPE
+        self._resolving = set()
+
+    def _new_typeid(self):
+        typeid = self._next_typeid
+        self._next_typeid += 1
+        return typeid
+
+    def typeid(self, expr):
+        kind = expr[0]
+        if kind == 'name':
+            return self._named(expr[1])
+        if kind == 'ptr':
+            return self.typeid(expr[1])
+        if kind == 'slice':
+            if expr[1] == ('name', 'byte') or expr[1] == ('name', 'uint8'):
+                return BYTE_SLICE
+            return self._compound_type(GoSlice, self.typeid(expr[1]))
+        if kind == 'array':
+            return self._compound_type(GoArray, self.typeid(expr[2]),
+                                       expr[1])
+        if kind == 'map':
+            return self._compound_type(GoMap, self.typeid(expr[1]),
+                                       self.typeid(expr[2]))
+        if kind == 'struct':
+            raise NotImplementedError('cannot compile anonymous structs')
+        raise NotImplementedError('cannot compile interface types')
+
+    def _named(self, name):
+        typeid = self._names.get(name)
+        if typeid is not None:
+            return typeid
+        if name in BUILTINS:
+            return BUILTINS[name]
+        expr = self._declarations.get(name)
+        if expr is None:
+            raise NotImplementedError('cannot compile undeclared type %s' %
+                                      name)
+        if expr[0] != 'struct':
+            # Named slices, maps and so on are sent like unnamed ones.
+            if name in self._resolving:
+                raise ValueError('invalid recursive type %s' % name)
+            self._resolving.add(name)
+            typeid = self.typeid(expr)
+            self._resolving.discard(name)
+            return typeid
+
+        # The ID is assigned first, so that fields can refer back to
+        # the struct.
+        typeid = self._new_typeid()
+        self._names[name] = typeid
+        fields = [(field, self.typeid(field_expr))
+                  for (field, field_expr) in expr[1]
+                  # Unexported fields are not sent.
+                  if field[0].isupper()]
+        self.loader.add_type(typeid, GoStruct(typeid, name, self.loader,
+                                              fields))
+        return typeid
+
+    def _compound_type(self, cls, *args):
+        key = (cls, ) + args
+        typeid = self._compound.get(key)
+        if typeid is None:
+            typeid = self._new_typeid()
+            self._compound[key] = typeid
+            self.loader.add_type(typeid, cls(typeid, self.loader, *args))
+        return typeid
+
+
+def parse_go(text):
+    """Return the struct types declared in Go source text.
+
+    >>> parse_go('''
+    ... type Point struct {
+    ...     X, Y int
+    ...     label string  // unexported fields are not sent
+    ... }
+    ... ''')
+    [<GoStruct Point X=2, Y=2>]
+    """
+    declarations = _Parser(text).declarations()
+    builder = _Builder(declarations)
+    return [builder.loader.get_type(builder.typeid(('name', name)))
+            for (name, expr) in declarations if expr[0] == 'struct']
+
+
+def parse_gob(buf):
+    """Return the struct types defined at the start of a gob stream."""
+    loader = Loader()
+    loader.load_types(buf)
+    return [go_type for go_type in loader.types[FIRST_CUSTOM_TYPE:]
+            if isinstance(go_type, GoStruct)]
+
+
+def _lookup(go_type, typeid):
+    result = go_type._loader.get_type(typeid)
+    if result is None:
+        raise LookupError('type %d is not defined' % typeid)
+    return result
+
+
+def signature(go_type, _enclosing=()):
+    """Return a description of the structure of go_type.
+
+    Two types with the same signature are encoded in the same way.
+    The signature of a struct includes its name and field names, a
+    struct referring back to an enclosing struct is represented by
+    its name alone:
+
+    >>> [node] = parse_go('type Node struct { Value int; Next *Node }')
+    >>> signature(node)
+    ('struct', 'Node', (('Value', 2), ('Next', ('ref', 'Node'))))
+
+    Raises LookupError if go_type refers to types which have not been
+    defined yet.
+    """
+    if isinstance(go_type, GoStruct):
+        name = go_type._name
+        if name in _enclosing:
+            return ('ref', name)
+        enclosing = _enclosing + (name, )
+        return ('struct', name, tuple(
+            (field, signature(_lookup(go_type, typeid), enclosing))
+            for (field, typeid) in go_type._fields))
+    if isinstance(go_type, GoSlice):
+        return ('slice', signature(_lookup(go_type, go_type._elem),
+                                   _enclosing))
+    if isinstance(go_type, GoArray):
+        return ('array', go_type._length,
+                signature(_lookup(go_type, go_type._elem), _enclosing))
+    if isinstance(go_type, GoMap):
+        return ('map',
+                signature(_lookup(go_type, go_type._key_typeid), _enclosing),
+                signature(_lookup(go_type, go_type._elem_typeid),
+                          _enclosing))
+    if go_type.typeid not in SCALARS:
+        raise NotImplementedError('cannot compile %s' % go_type)
+    return go_type.typeid
+
+
+def _recursive(sig):
+    """Return True if a signature refers back to an enclosing struct."""
+    if not isinstance(sig, tuple):
+        return False
+    if sig[0] == 'ref':
+        return True
+    if sig[0] == 'struct':
+        return any(_recursive(field) for (name, field) in sig[2])
+    return any(_recursive(part) for part in sig[1:])
+
+
+class _Generator:
+    """Generate the source of a module with decoders and encoders."""
+
+    def __init__(self):
+        self._lines = []
+        self._functions = {}
+        self._structs = {}
+
+    def struct(self, go_type):
+        """Generate the functions for a struct unless already done."""
+        name = go_type._name
+        sig = signature(go_type)
+        known = self._structs.get(name)
+        if known is not None:
+            if known != sig:
+                raise ValueError('conflicting definitions of %s' % name)
+            return
+        self._structs[name] = sig
+        self._lines.append('')
+        self._lines.append('')
+        self._lines.append('%s = _collections.namedtuple(%r, %r)' %
+                           (name, name, [f for (f, t) in go_type._fields]))
+        self._decode_struct(go_type)
+        self._encode_struct(go_type)
+
+    def functions(self, go_type):
+        """Return the names of the decoder and encoder of go_type."""
+        if isinstance(go_type, GoStruct):
+            self.struct(go_type)
+            return 'decode_%s' % go_type._name, 'encode_%s' % go_type._name
+        if not isinstance(go_type, (GoSlice, GoArray, GoMap)):
+            prefix = '_%s' % SCALARS[signature(go_type)][0]
+            return prefix + '_at', prefix + '_encode'
+        sig = signature(go_type)
+        functions = self._functions.get(sig)
+        if functions is None:
+            count = len(self._functions) + 1
+            functions = ('_decode_%d' % count, '_encode_%d' % count)
+            self._functions[sig] = functions
+            if isinstance(go_type, GoMap):
+                self._map(go_type, *functions)
+            else:
+                self._sequence(go_type, *functions)
+        return functions
+
+    def zero(self, go_type):
+        """Return the source of an expression for the zero value."""
+        if isinstance(go_type, GoStruct):
+            return '%s(%s)' % (go_type._name,
+                               ', '.join(self._field_zeros(go_type)))
+        if isinstance(go_type, GoSlice):
+            return '[]'
+        if isinstance(go_type, GoMap):
+            return '{}'
+        if isinstance(go_type, GoArray):
+            elem = self.zero(_lookup(go_type, go_type._elem))
+            if elem in _CONSTANT_ZEROS:
+                return '(%s, ) * %d' % (elem, go_type._length)
+            return 'tuple(%s for _ in range(%d))' % (elem, go_type._length)
+        return SCALARS[signature(go_type)][1]
+
+    def _field_types(self, go_type):
+        return [_lookup(go_type, typeid) for (name, typeid) in go_type._fields]
+
+    def _field_zeros(self, go_type):
+        # Fields referring back to the struct are cut off like in
+        # GoStruct._zero_parts.
+        return ['None' if go_type._recursive_field(t) else self.zero(t)
+                for t in self._field_types(go_type)]
+
+    def _decode_struct(self, go_type):
+        name = go_type._name
+        field_types = self._field_types(go_type)
+        zeros = self._field_zeros(go_type)
+        lines = ['', '', 'def decode_%s(buf, pos):' % name]
+        for i, zero in enumerate(zeros):
+            if zero not in _CONSTANT_ZEROS:
+                # Mutable zero values are only made for missing fields.
+                zero = 'None'
+            lines.append('    f%d = %s' % (i, zero))
+        lines.extend([
+            '    field = -1',
+            '    while True:',
+            '        delta, pos = _GoUint_at(buf, pos)',
+            '        if not delta:',
+            '            break',
+            '        field += delta',
+        ])
+        for i, field_type in enumerate(field_types):
+            decode, encode = self.functions(field_type)
+            keyword = 'elif' if i else 'if'
+            lines.append('        %s field == %d:' % (keyword, i))
+            lines.append('            f%d, pos = %s(buf, pos)' % (i, decode))
+        lines.append('        %s:' % ('else' if field_types else 'if True'))
+        lines.append('            raise AssertionError('
+                     '"unknown field %%d in %s" %% field)' % name)
+        for i, zero in enumerate(zeros):
+            if zero not in _CONSTANT_ZEROS and zero != 'None':
+                lines.append('    if f%d is None:' % i)
+                lines.append('        f%d = %s' % (i, zero))
+        lines.append('    return %s(%s), pos' % (
+            name, ', '.join('f%d' % i for i in range(len(zeros)))))
+        self._lines.extend(lines)
+
+    def _encode_struct(self, go_type):
+        name = go_type._name
+        field_types = self._field_types(go_type)
+        lines = ['', '', 'def encode_%s(value):' % name]
+        if field_types:
+            lines.append('    %s, = value' % ', '.join(
+                'f%d' % i for i in range(len(field_types))))
+        lines.extend(['    parts = []', '    last = -1'])
+        for i, field_type in enumerate(field_types):
+            decode, encode = self.functions(field_type)
+            # Zero values are left out like in GoStruct.encode.
+            if field_type.omit_zero:
+                lines.append('    if f%d:' % i)
+            else:
+                lines.append('    if f%d is not None:' % i)
+            lines.append('        parts.append(_GoUint_encode(%d - last))' % i)
+            lines.append('        parts.append(%s(f%d))' % (encode, i))
+            lines.append('        last = %d' % i)
+        lines.append("    parts.append(b'\\x00')")
+        lines.append("    return b''.join(parts)")
+        self._lines.extend(lines)
+
+    def _sequence(self, go_type, decode, encode):
+        elem_decode, elem_encode = self.functions(
+            _lookup(go_type, go_type._elem))
+        is_array = isinstance(go_type, GoArray)
+        lines = ['', '', 'def %s(buf, pos):' % decode,
+                 '    count, pos = _GoUint_at(buf, pos)']
+        if is_array:
+            lines.append('    assert count == %d, '
+                         '"expected %d elements, found %%d" %% count' %
+                         (go_type._length, go_type._length))
+        lines.extend([
+            '    result = []',
+            '    append = result.append',
+            '    for _ in range(count):',
+            '        value, pos = %s(buf, pos)' % elem_decode,
+            '        append(value)',
+            '    return %s, pos' % ('tuple(result)' if is_array else 'result'),
+            '',
+            '',
+            'def %s(values):' % encode,
+        ])
+        if is_array:
+            lines.append('    assert len(values) == %d, '
+                         '"expected %d elements, found %%d" %% len(values)' %
+                         (go_type._length, go_type._length))
+        lines.append("    return _GoUint_encode(len(values)) + "
+                     "b''.join(map(%s, values))" % elem_encode)
+        self._lines.extend(lines)
+
+    def _map(self, go_type, decode, encode):
+        key_decode, key_encode = self.functions(
+            _lookup(go_type, go_type._key_typeid))
+        elem_decode, elem_encode = self.functions(
+            _lookup(go_type, go_type._elem_typeid))
+        self._lines.extend([
+            '',
+            '',
+            'def %s(buf, pos):' % decode,
+            '    count, pos = _GoUint_at(buf, pos)',
+            '    result = {}',
+            '    for _ in range(count):',
+            '        key, pos = %s(buf, pos)' % key_decode,
+            '        result[key], pos = %s(buf, pos)' % elem_decode,
+            '    return result, pos',
+            '',
+            '',
+            'def %s(mapping):' % encode,
+            '    parts = [_GoUint_encode(len(mapping))]',
+            '    for key, value in mapping.items():',
+            '        parts.append(%s(key))' % key_encode,
+            '        parts.append(%s(value))' % elem_encode,
+            "    return b''.join(parts)",
+        ])
+
+    def source(self, description):
+        lines = [
+            '"""Gob decoders and encoders generated from %s.' % description,
+            '',
+            'This module was generated by python -m pygob compile.',
+            '"""',
+            '',
+            # Imports are private, since the classes of the structs
+            # are named after the Go types and may be called anything.
+            'import collections as _collections',
+            '',
+            'from pygob import types as _types',
+            'from pygob.schema import Schema as _Schema',
+            '',
+        ]
+        for typeid, (cls, zero) in sorted(SCALARS.items()):
+            lines.append('_%s_at = _types.%s.decode_at' % (cls, cls))
+            lines.append('_%s_encode = _types.%s.encode' % (cls, cls))
+        lines.extend(self._lines)
+        lines.extend(['', '', 'SCHEMA = _Schema({'])
+        for name, sig in sorted(self._structs.items()):
+            lines.append('    %r: (' % name)
+            lines.append('        %r,' % (sig, ))
+            lines.append('        %s, decode_%s, encode_%s),' %
+                         (name, name, name))
+        lines.append('})')
+        return '\n'.join(lines) + '\n'
+
+
+def generate(structs, description='a schema'):
+    """Return the source of a Python module with a decoder and encoder
+    for each of the given struct types and the types they use.
+    Recursive structs are skipped."""
+    generator = _Generator()
+    for go_type in structs:
+        if not _recursive(signature(go_type)):
+            generator.struct(go_type)
+    return generator.source(description)
+
+
+class CompiledStruct(GoStruct):
+    """A struct decoded and encoded by generated functions.
+
+    The engine treats compiled structs like scalars and lets them
+    decode themselves.
+    """
+    __slots__ = ('_decode', '_encode')
+    kind = SCALAR
+
+    def __init__(self, go_type, cls, decode, encode):
+        super().__init__(go_type.typeid, go_type._name, go_type._loader,
+                         go_type._fields)
+        self._class = cls
+        self._decode = decode
+        self._encode = encode
+
+    def decode_at(self, buf, pos):
+        return self._decode(buf, pos)
+
+    def skip_at(self, buf, pos):
+        return skip_at(self, buf, pos, STRUCT)
+
+    def encode(self, value):
+        return self._encode(value)
+
+
+class Schema:
+    """Compiled struct types by name, as found in generated modules."""
+
+    def __init__(self, types):
+        self._types = types
+
+    def __contains__(self, name):
+        return name in self._types
+
+    def match(self, go_type):
+        """Return a compiled version of go_type or None if there is no
+        compiled struct with the same name and structure.
+
+        Raises LookupError if go_type refers to types which have not
+        been defined yet.
+        """
+        if not isinstance(go_type, GoStruct):
+            return None
+        compiled = self._types.get(go_type._name)
+        if compiled is None:
+            return None
+        sig, cls, decode, encode = compiled
+        if signature(go_type) != sig or _recursive(sig):
+            return None
+        return CompiledStruct(go_type, cls, decode, encode)
@@ -0,0 +1,218 @@
+"""Reading and writing gob streams from file objects.
+
+Streams can be compressed with any of the compression formats in the
+standard library. Data is decompressed into a bounded window which is
+fed to a `Decoder`, so memory use is independent of the size of the
+stream. Before Python 3.5, bz2 and lzma data is decompressed a whole
+chunk at a time. Encoded values are collected into large blocks before they are
+compressed and written.
+"""
+
+import bz2
+import lzma
+import zlib
+
+from .decoder import Decoder
+from .dumper import Dumper
+
+COMPRESSIONS = ('zlib', 'gzip', 'bz2', 'lzma')
+
+# Default number of bytes read from a file or decompressed in one go.
+CHUNK_SIZE = 64 * 1024
+
+# Default number of encoded bytes collected before compressing them.
+BLOCK_SIZE = 1024 * 1024
+
+
+def detect_compression(head):
+    """Detect the compression format from the first bytes of a stream.
+
+    Returns the name of the format or None for an uncompressed gob
+    stream:
+
+    >>> detect_compression(b'\\x1f\\x8b\\x08\\x00')
+    'gzip'
+    >>> detect_compression(bytes([3, 4, 0, 2])) is None
+    True
+
+    None of the magic numbers below can start a valid gob stream:
+    they would all be followed by a type ID in the reserved range or
+    an integer longer than eight bytes.
+    """
+    if head[:2] == b'\x1f\x8b':
+        return 'gzip'
+    if head[:3] == b'BZh':
+        return 'bz2'
+    if head[:6] == b'\xfd7zXZ\x00':
+        return 'lzma'
+    if head[:1] == b'\x78' and head[1:2] in (b'\x01', b'\x5e', b'\x9c',
+                                             b'\xda'):
+        return 'zlib'
+    return None
+
+
+def _decompressor(compression):
+    if compression == 'zlib':
+        return zlib.decompressobj()
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if compression == 'bz2':
+        return bz2.BZ2Decompressor()
+    if compression == 'lzma':
+        return lzma.LZMADecompressor()
+    raise ValueError('unknown compression: %s' % compression)
+
+
+def _compressor(compression):
+    if compression == 'zlib':
+        return zlib.compressobj()
+    if compression == 'gzip':
+        return zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    if compression == 'bz2':
+        return bz2.BZ2Compressor()
+    if compression == 'lzma':
+        return lzma.LZMACompressor()
+    raise ValueError('unknown compression: %s' % compression)
+
+
+def _inflate(decompressor, data, window):
+    """Decompress data in blocks of at most window bytes."""
+    if not hasattr(decompressor, 'unconsumed_tail') and \
+            not hasattr(decompressor, 'needs_input'):
+        # Before Python 3.5, the bz2 and lzma objects cannot limit
+        # their output. The output for each chunk is split instead.
+        block = decompressor.decompress(data)
+        for start in range(0, len(block), window):
+            yield block[start:start + window]
+        return
+
+    # The zlib objects keep input beyond the window in
+    # unconsumed_tail, the bz2 and lzma objects buffer it internally
+    # and signal when they need more input.
+    buffered = hasattr(decompressor, 'needs_input')
+    while True:
+        block = decompressor.decompress(data, window)
+        if block:
+            yield block
+        if decompressor.eof:
+            return
+        if buffered:
+            if decompressor.needs_input:
+                return
+            data = b''
+        else:
+            data = decompressor.unconsumed_tail
+            if not data and len(block) < window:
+                return
+
+
+def decompress(chunks, compression, window=CHUNK_SIZE):
+    """Decompress an iterable of chunks into blocks of at most window
+    bytes. Concatenated compressed streams, such as multi-member gzip
+    files, are decompressed one after the other:
+
+    >>> import gzip
+    >>> data = gzip.compress(b'abc') + gzip.compress(b'def')
+    >>> list(decompress([data], 'gzip', window=2))
+    [b'ab', b'c', b'de', b'f']
+    """
+    decompressor = _decompressor(compression)
+    started = False
+    for data in chunks:
+        while data:
+            if decompressor.eof:
+                decompressor = _decompressor(compression)
+            started = True
+            yield from _inflate(decompressor, data, window)
+            data = decompressor.unused_data if decompressor.eof else b''
+    assert not started or decompressor.eof, 'truncated %s stream' % compression
+
+
+def read_chunks(fp, compression='auto', chunk_size=CHUNK_SIZE):
+    """Read a possibly compressed stream from a binary file object.
+
+    With compression='auto', the format is detected from the first
+    bytes of the stream. Use compression=None for a stream which is
+    known to be uncompressed.
+    """
+    chunk = fp.read(chunk_size)
+    if compression == 'auto':
+        compression = detect_compression(chunk)
+
+    def raw():
+        data = chunk
+        while data:
+            yield data
+            data = fp.read(chunk_size)
+
+    if compression is None:
+        return raw()
+    return decompress(raw(), compression, chunk_size)
+
+
+def load_stream(fp, compression='auto', chunk_size=CHUNK_SIZE, loader=None):
+    """Decode all gobs in a possibly compressed binary file object.
+
+    The values are returned as an iterator and only chunk_size
+    decompressed bytes are held in memory at a time, plus the segment
+    currently being decoded.
+    """
+    decoder = Decoder(loader)
+    for chunk in read_chunks(fp, compression, chunk_size):
+        yield from decoder.feed(chunk)
+    decoder.close()
+
+
+class StreamWriter:
+    """Encode values to a possibly compressed binary file object.
+
+    Encoded values are collected until block_size bytes are pending
+    and are then compressed and written in one go. Call close (or use
+    the writer as a context manager) to write the final block. The
+    file object itself is not closed.
+    """
+
+    def __init__(self, fp, compression=None, block_size=BLOCK_SIZE,
+                 dumper=None):
+        self._fp = fp
+        self._compressor = (_compressor(compression)
+                            if compression is not None else None)
+        self._block_size = block_size
+        self._dumper = Dumper() if dumper is None else dumper
+        self._pending = []
+        self._size = 0
+
+    def dump(self, value):
+        """Encode a value and queue it for writing."""
+        encoded = self._dumper.dump(value)
+        self._pending.append(encoded)
+        self._size += len(encoded)
+        if self._size >= self._block_size:
+            self.flush()
+
+    def flush(self):
+        """Write the pending values.
+
+        With compression, the compressor may keep some of the data
+        until more is written or the writer is closed.
+        """
+        data = b''.join(self._pending)
+        self._pending = []
+        self._size = 0
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        if data:
+            self._fp.write(data)
+
+    def close(self):
+        """Write all pending values and end the compressed stream."""
+        self.flush()
+        if self._compressor is not None:
+            self._fp.write(self._compressor.flush())
+            self._compressor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
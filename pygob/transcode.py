@@ -0,0 +1,530 @@
+"""Transcoding of gob streams to NDJSON and MessagePack.
+
+The transcoder never builds Python values for the structs, slices and
+maps in the stream. For each type it compiles an emitter which reads
+the gob encoding and appends the output encoding to a list of byte
+strings. Struct field names and the output for zero values are
+encoded once per type.
+"""
+
+import base64
+import json
+import math
+import struct
+import time
+
+from .decoder import Framer
+from .loader import Loader
+from .stream import CHUNK_SIZE, read_chunks
+from .types import (BOOL, INT, UINT, FLOAT, BYTE_SLICE, STRING, COMPLEX,
+                    GoInt, GoUint, GoFloat, GoStruct, GoSlice, GoArray, GoMap)
+
+# Number of output bytes collected before writing them.
+BUFFER_SIZE = 1024 * 1024
+
+_uint_at = GoUint.decode_at
+_int_at = GoInt.decode_at
+_float_at = GoFloat.decode_at
+
+
+def _bytes_at(buf, pos):
+    count, pos = _uint_at(buf, pos)
+    end = pos + count
+    return buf[pos:end], end
+
+
+class _Compiler:
+    """Compile emitters for the types of a loader.
+
+    Subclasses define how scalars are written and how sequences and
+    mappings are framed.
+    """
+
+    # Separators between items and between keys and values.
+    item_sep = b''
+    key_sep = b''
+    # Written for fields referring back to their struct, which have
+    # None as zero value when decoded.
+    null = b''
+    # Written after each top-level value.
+    record_end = b''
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._emitters = {}
+        self._zeros = {}
+
+    def emitter(self, typeid):
+        """Return a function emit(buf, pos, out) -> pos for typeid."""
+        emit = self._emitters.get(typeid)
+        if emit is None:
+            # Recursive types refer to themselves before their emitter
+            # is compiled, so they get an indirection at first.
+            compiled = []
+            self._emitters[typeid] = (
+                lambda buf, pos, out: compiled[0](buf, pos, out))
+            emit = self._compile(typeid)
+            compiled.append(emit)
+            self._emitters[typeid] = emit
+        return emit
+
+    def zero(self, typeid):
+        """Return the encoding of the zero value of typeid."""
+        zero = self._zeros.get(typeid)
+        if zero is None:
+            zero = self._zeros[typeid] = self._compile_zero(typeid)
+        return zero
+
+    def _field_zero(self, go_type, typeid):
+        """Return the encoding of the zero value of a struct field."""
+        if go_type._recursive_field(self._loader.get_type(typeid)):
+            return self.null
+        return self.zero(typeid)
+
+    def _compile(self, typeid):
+        go_type = self._loader.get_type(typeid)
+        if isinstance(go_type, GoStruct):
+            return self._struct(go_type)
+        if isinstance(go_type, (GoSlice, GoArray)):
+            return self._sequence(self.emitter(go_type._elem))
+        if isinstance(go_type, GoMap):
+            return self._map(self.map_key(go_type._key_typeid),
+                             self.emitter(go_type._elem_typeid))
+        emit = self.scalar(typeid)
+        if emit is None:
+            raise NotImplementedError('cannot transcode %s' % typeid)
+        return emit
+
+    def _compile_zero(self, typeid):
+        go_type = self._loader.get_type(typeid)
+        if isinstance(go_type, GoStruct):
+            parts = [self.struct_start(len(go_type._fields))]
+            for field_id, (name, field_typeid) in enumerate(go_type._fields):
+                parts.append(self.field_key(field_id, name))
+                parts.append(self._field_zero(go_type, field_typeid))
+            parts.append(self.struct_end)
+            return b''.join(parts)
+        if isinstance(go_type, GoArray):
+            zero = self.zero(go_type._elem)
+            items = self.item_sep.join([zero] * go_type._length)
+            return self.seq_start(go_type._length) + items + self.seq_end
+        if isinstance(go_type, GoSlice):
+            return self.seq_start(0) + self.seq_end
+        if isinstance(go_type, GoMap):
+            return self.map_start(0) + self.map_end
+        return self.scalar_zero(typeid)
+
+    def _struct(self, go_type):
+        fields = go_type._fields
+        count = len(fields)
+        start = self.struct_start(count)
+        end = self.struct_end
+        keys = [self.field_key(i, n) for i, (n, t) in enumerate(fields)]
+        defaults = [key + self._field_zero(go_type, t)
+                    for key, (n, t) in zip(keys, fields)]
+        emitters = [self.emitter(t) for (n, t) in fields]
+
+        def emit(buf, pos, out):
+            append = out.append
+            append(start)
+            field_id = -1
+            while True:
+                delta, pos = _uint_at(buf, pos)
+                if delta == 0:
+                    break
+                # Fields left out of the stream have the zero value.
+                for skipped in range(field_id + 1, field_id + delta):
+                    append(defaults[skipped])
+                field_id += delta
+                append(keys[field_id])
+                pos = emitters[field_id](buf, pos, out)
+            for skipped in range(field_id + 1, count):
+                append(defaults[skipped])
+            append(end)
+            return pos
+
+        return emit
+
+    def _sequence(self, emit_elem):
+        seq_start = self.seq_start
+        seq_end = self.seq_end
+        item_sep = self.item_sep
+
+        def emit(buf, pos, out):
+            count, pos = _uint_at(buf, pos)
+            out.append(seq_start(count))
+            for i in range(count):
+                if i and item_sep:
+                    out.append(item_sep)
+                pos = emit_elem(buf, pos, out)
+            out.append(seq_end)
+            return pos
+
+        return emit
+
+    def _map(self, emit_key, emit_elem):
+        map_start = self.map_start
+        map_end = self.map_end
+        item_sep = self.item_sep
+        key_sep = self.key_sep
+
+        def emit(buf, pos, out):
+            count, pos = _uint_at(buf, pos)
+            out.append(map_start(count))
+            for i in range(count):
+                if i and item_sep:
+                    out.append(item_sep)
+                pos = emit_key(buf, pos, out)
+                out.append(key_sep)
+                pos = emit_elem(buf, pos, out)
+            out.append(map_end)
+            return pos
+
+        return emit
+
+    def map_key(self, typeid):
+        return self.emitter(typeid)
+
+
+def _json_float(f):
+    # Like the json module, which also emits the non-standard NaN and
+    # Infinity literals.
+    if math.isfinite(f):
+        return repr(f).encode('ascii')
+    if math.isnan(f):
+        return b'NaN'
+    return b'Infinity' if f > 0 else b'-Infinity'
+
+
+def _json_string(s):
+    s = s.decode('utf-8', 'replace')
+    return json.encoder.encode_basestring_ascii(s).encode('ascii')
+
+
+def _json_int(buf, pos, out):
+    n, pos = _int_at(buf, pos)
+    out.append(str(n).encode('ascii'))
+    return pos
+
+
+def _json_uint(buf, pos, out):
+    n, pos = _uint_at(buf, pos)
+    out.append(str(n).encode('ascii'))
+    return pos
+
+
+def _json_bool(buf, pos, out):
+    n, pos = _uint_at(buf, pos)
+    out.append(b'true' if n else b'false')
+    return pos
+
+
+def _json_float_emit(buf, pos, out):
+    f, pos = _float_at(buf, pos)
+    out.append(_json_float(f))
+    return pos
+
+
+def _json_complex(buf, pos, out):
+    re, pos = _float_at(buf, pos)
+    im, pos = _float_at(buf, pos)
+    out.append(b'[' + _json_float(re) + b',' + _json_float(im) + b']')
+    return pos
+
+
+def _json_string_emit(buf, pos, out):
+    s, pos = _bytes_at(buf, pos)
+    out.append(_json_string(s))
+    return pos
+
+
+def _json_bytes(buf, pos, out):
+    # Byte slices are base64 encoded, like Go's encoding/json does.
+    s, pos = _bytes_at(buf, pos)
+    out.append(b'"' + base64.b64encode(s) + b'"')
+    return pos
+
+
+class JSONCompiler(_Compiler):
+    """Emit one JSON document per line."""
+
+    item_sep = b','
+    key_sep = b':'
+    null = b'null'
+    record_end = b'\n'
+    struct_end = b'}'
+    seq_end = b']'
+    map_end = b'}'
+
+    _scalars = {
+        BOOL: _json_bool,
+        INT: _json_int,
+        UINT: _json_uint,
+        FLOAT: _json_float_emit,
+        BYTE_SLICE: _json_bytes,
+        STRING: _json_string_emit,
+        COMPLEX: _json_complex,
+    }
+
+    _scalar_zeros = {
+        BOOL: b'false',
+        INT: b'0',
+        UINT: b'0',
+        FLOAT: b'0.0',
+        BYTE_SLICE: b'""',
+        STRING: b'""',
+        COMPLEX: b'[0.0,0.0]',
+    }
+
+    def scalar(self, typeid):
+        return self._scalars.get(typeid)
+
+    def scalar_zero(self, typeid):
+        return self._scalar_zeros[typeid]
+
+    def struct_start(self, count):
+        return b'{'
+
+    def field_key(self, field_id, name):
+        key = _json_string(name.encode('utf-8')) + b':'
+        return key if field_id == 0 else b',' + key
+
+    @staticmethod
+    def seq_start(count):
+        return b'['
+
+    @staticmethod
+    def map_start(count):
+        return b'{'
+
+    def map_key(self, typeid):
+        # JSON object keys must be strings.
+        if typeid == STRING:
+            return _json_string_emit
+        emit_key = self.emitter(typeid)
+
+        def emit(buf, pos, out):
+            key = []
+            pos = emit_key(buf, pos, key)
+            out.append(_json_string(b''.join(key)))
+            return pos
+
+        return emit
+
+
+def _msgpack_header(count, fix, fix_limit, codes):
+    if count < fix_limit:
+        return bytes([fix | count])
+    if count < 0x10000:
+        return bytes([codes[0]]) + struct.pack('>H', count)
+    return bytes([codes[1]]) + struct.pack('>I', count)
+
+
+def _msgpack_int(n):
+    if 0 <= n < 0x80:
+        return bytes([n])
+    if -0x20 <= n < 0:
+        return struct.pack('>b', n)
+    if n >= 0:
+        return b'\xcf' + struct.pack('>Q', n)
+    return b'\xd3' + struct.pack('>q', n)
+
+
+def _msgpack_str(s):
+    if len(s) < 0x20:
+        return bytes([0xa0 | len(s)]) + s
+    if len(s) < 0x100:
+        return b'\xd9' + bytes([len(s)]) + s
+    return _msgpack_header(len(s), 0, 0, (0xda, 0xdb)) + s
+
+
+def _msgpack_bin(s):
+    if len(s) < 0x100:
+        return b'\xc4' + bytes([len(s)]) + s
+    if len(s) < 0x10000:
+        return b'\xc5' + struct.pack('>H', len(s)) + s
+    return b'\xc6' + struct.pack('>I', len(s)) + s
+
+
+def _msgpack_float(f):
+    return b'\xcb' + struct.pack('>d', f)
+
+
+def _msgpack_int_emit(buf, pos, out):
+    n, pos = _int_at(buf, pos)
+    out.append(_msgpack_int(n))
+    return pos
+
+
+def _msgpack_uint(buf, pos, out):
+    n, pos = _uint_at(buf, pos)
+    out.append(_msgpack_int(n))
+    return pos
+
+
+def _msgpack_bool(buf, pos, out):
+    n, pos = _uint_at(buf, pos)
+    out.append(b'\xc3' if n else b'\xc2')
+    return pos
+
+
+def _msgpack_float_emit(buf, pos, out):
+    f, pos = _float_at(buf, pos)
+    out.append(_msgpack_float(f))
+    return pos
+
+
+def _msgpack_complex(buf, pos, out):
+    re, pos = _float_at(buf, pos)
+    im, pos = _float_at(buf, pos)
+    out.append(b'\x92' + _msgpack_float(re) + _msgpack_float(im))
+    return pos
+
+
+def _msgpack_string(buf, pos, out):
+    s, pos = _bytes_at(buf, pos)
+    out.append(_msgpack_str(s))
+    return pos
+
+
+def _msgpack_bytes(buf, pos, out):
+    s, pos = _bytes_at(buf, pos)
+    out.append(_msgpack_bin(s))
+    return pos
+
+
+class MsgpackCompiler(_Compiler):
+    """Emit a stream of MessagePack values.
+
+    Structs become maps keyed by field name, slices and arrays become
+    arrays, strings become str and byte slices become bin values.
+    """
+
+    null = b'\xc0'
+    struct_end = b''
+    seq_end = b''
+    map_end = b''
+
+    _scalars = {
+        BOOL: _msgpack_bool,
+        INT: _msgpack_int_emit,
+        UINT: _msgpack_uint,
+        FLOAT: _msgpack_float_emit,
+        BYTE_SLICE: _msgpack_bytes,
+        STRING: _msgpack_string,
+        COMPLEX: _msgpack_complex,
+    }
+
+    _scalar_zeros = {
+        BOOL: b'\xc2',
+        INT: b'\x00',
+        UINT: b'\x00',
+        FLOAT: _msgpack_float(0.0),
+        BYTE_SLICE: b'\xc4\x00',
+        STRING: b'\xa0',
+        COMPLEX: b'\x92' + _msgpack_float(0.0) * 2,
+    }
+
+    def scalar(self, typeid):
+        return self._scalars.get(typeid)
+
+    def scalar_zero(self, typeid):
+        return self._scalar_zeros[typeid]
+
+    def struct_start(self, count):
+        return self.map_start(count)
+
+    def field_key(self, field_id, name):
+        return _msgpack_str(name.encode('utf-8'))
+
+    @staticmethod
+    def seq_start(count):
+        return _msgpack_header(count, 0x90, 0x10, (0xdc, 0xdd))
+
+    @staticmethod
+    def map_start(count):
+        return _msgpack_header(count, 0x80, 0x10, (0xde, 0xdf))
+
+
+FORMATS = {
+    'ndjson': JSONCompiler,
+    'msgpack': MsgpackCompiler,
+}
+
+
+class Transcoder:
+    """Transcode a gob stream fed in chunks:
+
+    >>> transcoder = Transcoder('ndjson')
+    >>> transcoder.feed(bytes([3, 4, 0, 2, 8, 12, 0, 5, 104, 101]))
+    b'1\\n'
+    >>> transcoder.feed(bytes([108, 108, 111]))
+    b'"hello"\\n'
+    >>> transcoder.close()
+    """
+
+    def __init__(self, format='ndjson', loader=None):
+        if format not in FORMATS:
+            raise ValueError('unknown format: %s' % format)
+        self.loader = Loader() if loader is None else loader
+        self._compiler = FORMATS[format](self.loader)
+        self._framer = Framer()
+
+    def feed(self, data):
+        """Add data to the stream and return the output for the values
+        completed so far."""
+        out = []
+        for segment in self._framer.feed(data):
+            self.transcode_segment(segment, out)
+        return b''.join(out)
+
+    def transcode_segment(self, segment, out):
+        """Transcode a single segment and append the output to out."""
+        loader = self.loader
+        stats = loader._stats
+        if stats is not None:
+            stats.record_segment(len(segment))
+        typeid, pos = GoInt.decode_at(segment, 0)
+        if typeid < 0:
+            loader._register_type(-typeid, segment[pos:])
+            return
+        if stats is not None:
+            start = time.perf_counter()
+            nbytes = len(segment) - pos
+        if not isinstance(loader.get_type(typeid), GoStruct):
+            # Skip the zero delta in front of top-level singletons.
+            assert segment[pos] == 0, ('illegal delta for singleton: %s' %
+                                       segment[pos])
+            pos += 1
+        pos = self._compiler.emitter(typeid)(segment, pos, out)
+        if stats is not None:
+            stats.record_value(typeid, nbytes, time.perf_counter() - start)
+        assert pos == len(segment), ('trailing data in segment: %s' %
+                                     list(segment[pos:]))
+        out.append(self._compiler.record_end)
+
+    def close(self):
+        """Signal the end of the stream."""
+        self._framer.close()
+
+
+def transcode(src, dst, format='ndjson', compression='auto',
+              chunk_size=CHUNK_SIZE, buffer_size=BUFFER_SIZE):
+    """Transcode a gob stream from the binary file object src to dst.
+
+    Output is collected until buffer_size bytes are pending and then
+    written in one go.
+    """
+    transcoder = Transcoder(format)
+    out = []
+    size = 0
+    for chunk in read_chunks(src, compression, chunk_size):
+        data = transcoder.feed(chunk)
+        out.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            dst.write(b''.join(out))
+            out = []
+            size = 0
+    transcoder.close()
+    dst.write(b''.join(out))
@@ -4,9 +4,12 @@ These are the well-known gob types that both senders and receivers
 already agree on to bootstrap the protocol.
 """
 
+import copy
 import struct
 import collections
 
+from .engine import SCALAR, STRUCT, SLICE, ARRAY, MAP, decode_at, skip_at
+
 # We do not use an Enum for this since this set isn't the full set of
 # all type IDs -- the protocol allows a sender to define custom IDs in
 # terms of the IDs below.
@@ -27,6 +30,8 @@ STRUCT_TYPE = 20
 FIELD_TYPE = 21
 FIELD_TYPE_SLICE = 22
 MAP_TYPE = 23
+# Custom types defined in a stream are numbered from here on.
+FIRST_CUSTOM_TYPE = 65
 
 
 class classproperty(object):
@@ -43,7 +48,47 @@ class GoType:
     Go types know how to decode a gob stream to their corresponding
     Python type.
     """
-    pass
+    __slots__ = ()
+    kind = None
+
+    # Struct fields with a zero value are left out of the encoding,
+    # like Go does. Zero values of these types are false in Python.
+    omit_zero = True
+
+    def decode(self, buf):
+        """Decode a value from buf. Returns the value and the remainder of
+        the buffer."""
+        value, pos = self.decode_at(buf, 0)
+        return value, buf[pos:]
+
+    def decode_at(self, buf, pos):
+        """Decode a value from buf at position pos. Returns the value and
+        the position after it."""
+        return decode_at(self, buf, pos)
+
+    def skip_at(self, buf, pos):
+        """Skip over a value in buf at position pos. Returns the position
+        after it. No values are built."""
+        return skip_at(self, buf, pos)
+
+    @classmethod
+    def _zero_parts(cls):
+        """Return the zero value as a (zero, factory) pair.
+
+        Types with immutable zero values return (zero, None). Types
+        with mutable zero values return (None, factory), where calling
+        factory makes a new zero value.
+        """
+        return cls.zero, None
+
+    def bind(self, loader):
+        """Return a copy of a custom type which looks up other types in
+        loader. The copy shares everything else with the original,
+        such as the named tuple class of a struct.
+        """
+        bound = copy.copy(self)
+        bound._loader = loader
+        return bound
 
 
 class GoBool(GoType):
@@ -52,6 +97,8 @@ class GoBool(GoType):
     Go Booleans are mapped to Python Booleans. This class is meant to
     be used statically.
     """
+    __slots__ = ()
+    kind = SCALAR
     typeid = BOOL
     zero = False
 
@@ -68,6 +115,15 @@ class GoBool(GoType):
         n, buf = GoUint.decode(buf)
         return n == 1, buf
 
+    @staticmethod
+    def decode_at(buf, pos):
+        n, pos = GoUint.decode_at(buf, pos)
+        return n == 1, pos
+
+    @staticmethod
+    def skip_at(buf, pos):
+        return GoUint.skip_at(buf, pos)
+
     @staticmethod
     def encode(b):
         """Encode a Python Boolean as a Go bool:
@@ -86,6 +142,8 @@ class GoUint(GoType):
     Go unsigned integers are mapped to Python integers. This class is
     meant to be used statically.
     """
+    __slots__ = ()
+    kind = SCALAR
     typeid = UINT
     zero = 0
 
@@ -110,6 +168,33 @@ class GoUint(GoType):
         n += buf[length]
         return n, buf[length + 1:]
 
+    @staticmethod
+    def decode_at(buf, pos):
+        """Decode an unsigned integer from buf at position pos. Returns the
+        integer and the position after it:
+
+        >>> GoUint.decode_at(bytes([7, 254, 1, 0]), 1)
+        (256, 4)
+        """
+        n = buf[pos]
+        if n < 128:  # small uint in a single byte
+            return n, pos + 1
+
+        # larger uint split over multiple bytes
+        end = pos + 257 - n
+        return int.from_bytes(buf[pos + 1:end], 'big'), end
+
+    @staticmethod
+    def skip_at(buf, pos):
+        """Skip over an unsigned integer in buf at position pos. Returns
+        the position after it:
+
+        >>> GoUint.skip_at(bytes([7, 254, 1, 0]), 1)
+        4
+        """
+        n = buf[pos]
+        return pos + 1 if n < 128 else pos + 257 - n
+
     @staticmethod
     def encode(n):
         """Encode a Python integer as an unsigned Go int:
@@ -138,6 +223,8 @@ class GoInt(GoType):
     Go signed integers are mapped to Python integers. This class is
     meant to be used statically.
     """
+    __slots__ = ()
+    kind = SCALAR
     typeid = INT
     zero = 0
 
@@ -156,6 +243,23 @@ class GoInt(GoType):
             uint = ~uint
         return uint >> 1, buf
 
+    @staticmethod
+    def decode_at(buf, pos):
+        """Decode a signed integer from buf at position pos. Returns the
+        integer and the position after it:
+
+        >>> GoInt.decode_at(bytes([5, 6]), 1)
+        (3, 2)
+        """
+        uint, pos = GoUint.decode_at(buf, pos)
+        if uint & 1:
+            uint = ~uint
+        return uint >> 1, pos
+
+    @staticmethod
+    def skip_at(buf, pos):
+        return GoUint.skip_at(buf, pos)
+
     @staticmethod
     def encode(n):
         """Encode a Python integer as a signed Go int:
@@ -178,6 +282,8 @@ class GoFloat(GoType):
     Go floats are mapped to Python floats. This class is meant to be
     used statically.
     """
+    __slots__ = ()
+    kind = SCALAR
     typeid = FLOAT
     zero = 0.0
 
@@ -196,6 +302,23 @@ class GoFloat(GoType):
         (f, ) = struct.unpack('<d', rev)
         return f, buf
 
+    @staticmethod
+    def decode_at(buf, pos):
+        """Decode a 64-bit floating point number from buf at position pos.
+        Returns the float and the position after it:
+
+        >>> GoFloat.decode_at(bytes([0, 254, 244, 63]), 1)
+        (1.25, 4)
+        """
+        n, pos = GoUint.decode_at(buf, pos)
+        rev = struct.pack('>Q', n)
+        (f, ) = struct.unpack('<d', rev)
+        return f, pos
+
+    @staticmethod
+    def skip_at(buf, pos):
+        return GoUint.skip_at(buf, pos)
+
     @staticmethod
     def encode(f):
         """Encode a Python floating point number as a Go float64:
@@ -234,6 +357,8 @@ class GoByteSlice(GoType):
 
     This class is meant to be used statically.
     """
+    __slots__ = ()
+    kind = SCALAR
     typeid = BYTE_SLICE
 
     @classproperty
@@ -251,6 +376,21 @@ class GoByteSlice(GoType):
         count, buf = GoUint.decode(buf)
         return bytearray(buf[:count]), buf[count:]
 
+    @staticmethod
+    def decode_at(buf, pos):
+        count, pos = GoUint.decode_at(buf, pos)
+        end = pos + count
+        return bytearray(buf[pos:end]), end
+
+    @staticmethod
+    def skip_at(buf, pos):
+        count, pos = GoUint.decode_at(buf, pos)
+        return pos + count
+
+    @staticmethod
+    def _zero_parts():
+        return None, bytearray
+
     @staticmethod
     def encode(buf):
         """Encode a Python bytes value as a Go byte slice:
@@ -268,6 +408,8 @@ class GoString(GoType):
     guarantee any particular encoding. This class is meant to be used
     statically.
     """
+    __slots__ = ()
+    kind = SCALAR
     typeid = STRING
     zero = b''
 
@@ -283,7 +425,18 @@ class GoString(GoType):
         # TODO: Go strings do not guarantee any particular encoding.
         # Add support for trying to decode the bytes using, say,
         # UTF-8, so we can return a real Python string.
-        return buf[:count], buf[count:]
+        return bytes(buf[:count]), buf[count:]
+
+    @staticmethod
+    def decode_at(buf, pos):
+        count, pos = GoUint.decode_at(buf, pos)
+        end = pos + count
+        return bytes(buf[pos:end]), end
+
+    @staticmethod
+    def skip_at(buf, pos):
+        count, pos = GoUint.decode_at(buf, pos)
+        return pos + count
 
     @staticmethod
     def encode(s):
@@ -293,8 +446,15 @@ class GoString(GoType):
 
         >>> GoString.encode('alpha: α')
         b'\\talpha: \\xce\\xb1'
+
+        Bytes, as returned when decoding a Go string, are used as-is:
+
+        >>> GoString.encode(b'hello')
+        b'\\x05hello'
         """
-        return GoByteSlice.encode(s.encode('utf-8'))
+        if isinstance(s, str):
+            s = s.encode('utf-8')
+        return GoByteSlice.encode(s)
 
 
 class GoComplex(GoType):
@@ -303,6 +463,8 @@ class GoComplex(GoType):
     Go complex numbers are mapped to Python complex numbers. This
     class is meant to be used statically.
     """
+    __slots__ = ()
+    kind = SCALAR
     typeid = COMPLEX
     zero = 0 + 0j
 
@@ -318,6 +480,16 @@ class GoComplex(GoType):
         im, buf = GoFloat.decode(buf)
         return complex(re, im), buf
 
+    @staticmethod
+    def decode_at(buf, pos):
+        re, pos = GoFloat.decode_at(buf, pos)
+        im, pos = GoFloat.decode_at(buf, pos)
+        return complex(re, im), pos
+
+    @staticmethod
+    def skip_at(buf, pos):
+        return GoUint.skip_at(buf, GoUint.skip_at(buf, pos))
+
     @staticmethod
     def encode(z):
         """Encode a complex number:
@@ -333,11 +505,16 @@ class GoStruct(GoType):
 
     Go structs are mapped to Python named tuples.
     """
+    __slots__ = ('typeid', '_name', '_loader', '_fields', '_class', '_zero',
+                 '_zero_fields', '_encoders', '_fast')
+    kind = STRUCT
+    # Go always sends nested structs.
+    omit_zero = False
 
     @property
     def zero(self):
-        values = [self._loader.types[t].zero for (n, t) in self._fields]
-        return self._class._make(values)
+        zero, factory = self._zero_parts()
+        return zero if factory is None else factory()
 
     def __init__(self, typeid, name, loader, fields):
         """A Go struct with a certain set of fields.
@@ -352,26 +529,139 @@ class GoStruct(GoType):
         ... ])
         >>> person.zero
         Person(Name=b'', Age=0)
+
+        Zero values are computed when first needed. A field which
+        refers back to the struct, directly or through other types,
+        such as a pointer to the next node in a list, has None as its
+        zero value:
+
+        >>> loader = Loader()
+        >>> node = GoStruct(142, 'Node', loader, [
+        ...     ('Value', INT),
+        ...     ('Next', 142),
+        ... ])
+        >>> loader.add_type(142, node)
+        >>> node.zero
+        Node(Value=0, Next=None)
         """
         self.typeid = typeid
         self._name = name
         self._loader = loader
         self._fields = fields
         self._class = collections.namedtuple(name, [n for (n, t) in fields])
+        self._zero = None
+        self._zero_fields = None
+        self._encoders = None
+        # The decoder of a struct of scalars, or False for other
+        # structs, see engine.fast_decoder.
+        self._fast = None
+
+    def bind(self, loader):
+        bound = super().bind(loader)
+        # The zero value depends on the types in the loader.
+        bound._zero = None
+        bound._zero_fields = None
+        bound._encoders = None
+        bound._fast = None
+        return bound
+
+    def _zero_parts(self):
+        if self._zero is None:
+            types = self._loader.types
+            template = []
+            fresh = []
+            for i, (name, typeid) in enumerate(self._fields):
+                field_type = types[typeid]
+                if self._recursive_field(field_type):
+                    template.append(None)
+                    continue
+                zero, factory = field_type._zero_parts()
+                template.append(zero)
+                if factory is not None:
+                    fresh.append((i, factory))
+            self._zero_fields = (template, fresh)
+            if fresh:
+                self._zero = (None, self._new_zero)
+            else:
+                self._zero = (self._class._make(template), None)
+        return self._zero
+
+    def _recursive_field(self, field_type):
+        """Return True if field_type is a struct or array which refers
+        back to this struct, and so has None as its zero value.
+
+        This depends only on the types and not on the order in which
+        zero values are computed. Slices and maps do not need this,
+        their zero values are empty. Raises LookupError if a type on
+        the way has not been defined yet.
+        """
+        if not isinstance(field_type, (GoStruct, GoArray)):
+            return False
+        types = self._loader.types
+        seen = set()
+        stack = [field_type.typeid]
+        while stack:
+            typeid = stack.pop()
+            if typeid == self.typeid:
+                return True
+            if typeid in seen:
+                continue
+            seen.add(typeid)
+            go_type = types[typeid]
+            if go_type is None:
+                raise LookupError('type %d is not defined' % typeid)
+            stack.extend(dependencies(go_type))
+        return False
+
+    def _zero_values(self):
+        """Return the zero field values and the (index, factory) pairs of
+        the fields with mutable zero values, which are None in the
+        field values."""
+        if self._zero_fields is None:
+            self._zero_parts()
+        return self._zero_fields
+
+    def _new_zero(self):
+        template, fresh = self._zero_fields
+        values = list(template)
+        for i, factory in fresh:
+            values[i] = factory()
+        return self._class._make(values)
 
-    def decode(self, buf):
-        """Decode data from buf and return a namedtuple."""
-        values = {}
-        field_id = -1
-        while True:
-            delta, buf = GoUint.decode(buf)
-            if delta == 0:
-                break
-            field_id += delta
-            name, typeid = self._fields[field_id]
-            value, buf = self._loader.types[typeid].decode(buf)
-            values[name] = value
-        return self.zero._replace(**values), buf
+    def _make(self, values):
+        """Make a value from a list of field values."""
+        return self._class._make(values)
+
+    def encode(self, value):
+        """Encode a named tuple or other sequence of field values.
+
+        Fields are matched by position. Fields which are None or have
+        the zero value are left out of the encoding, like Go does, and
+        get the zero value when decoded:
+
+        >>> from pygob import Loader
+        >>> person = GoStruct(142, 'Person', Loader(), [
+        ...     ('Name', STRING),
+        ...     ('Age', INT),
+        ... ])
+        >>> list(person.encode((b'', 35)))
+        [2, 70, 0]
+        """
+        if self._encoders is None:
+            types = self._loader.types
+            self._encoders = [(types[typeid].encode, types[typeid].omit_zero)
+                              for (name, typeid) in self._fields]
+        parts = []
+        last_id = -1
+        for field_id, (field, (encode, omit_zero)) in enumerate(
+                zip(value, self._encoders)):
+            if field is None or (omit_zero and not field):
+                continue
+            parts.append(GoUint.encode(field_id - last_id))
+            parts.append(encode(field))
+            last_id = field_id
+        parts.append(b'\x00')
+        return b''.join(parts)
 
     def __repr__(self):
         """GoStruct representation.
@@ -390,23 +680,25 @@ class GoWireType(GoStruct):
     Decoding a WIRE_TYPE value yields another GoType subclass which
     can be used later to decode actual values of the custom type.
     """
+    __slots__ = ()
 
-    def decode(self, buf):
-        """Decode data from buf and return a GoType."""
-        wire_type, buf = super().decode(buf)
+    def _make(self, values):
+        """Make a GoType from the decoded fields of a wire type."""
+        wire_type = self._class._make(values)
+        types = self._loader.types
 
-        if wire_type.ArrayT != self._loader.types[ARRAY_TYPE].zero:
+        if wire_type.ArrayT != types[ARRAY_TYPE].zero:
             typeid = wire_type.ArrayT.CommonType.Id
             elem = wire_type.ArrayT.Elem
             length = wire_type.ArrayT.Len
-            return GoArray(typeid, self._loader, elem, length), buf
+            return GoArray(typeid, self._loader, elem, length)
 
-        if wire_type.SliceT != self._loader.types[SLICE_TYPE].zero:
+        if wire_type.SliceT != types[SLICE_TYPE].zero:
             typeid = wire_type.SliceT.CommonType.Id
             elem = wire_type.SliceT.Elem
-            return GoSlice(typeid, self._loader, elem), buf
+            return GoSlice(typeid, self._loader, elem)
 
-        if wire_type.StructT != self._loader.types[STRUCT_TYPE].zero:
+        if wire_type.StructT != types[STRUCT_TYPE].zero:
             typeid = wire_type.StructT.CommonType.Id
             # Named tuples must be constructed using strings, not
             # bytes, so we need to decode the names here. Go source
@@ -414,13 +706,13 @@ class GoWireType(GoStruct):
             name = wire_type.StructT.CommonType.Name.decode('utf-8')
             fields = [(f.Name.decode('utf-8'), f.Id)
                       for f in wire_type.StructT.Field]
-            return GoStruct(typeid, name, self._loader, fields), buf
+            return GoStruct(typeid, name, self._loader, fields)
 
-        if wire_type.MapT != self._loader.types[MAP_TYPE].zero:
+        if wire_type.MapT != types[MAP_TYPE].zero:
             typeid = wire_type.MapT.CommonType.Id
             key_typeid = wire_type.MapT.Key
             elem_typeid = wire_type.MapT.Elem
-            return GoMap(typeid, self._loader, key_typeid, elem_typeid), buf
+            return GoMap(typeid, self._loader, key_typeid, elem_typeid)
 
         raise NotImplementedError("cannot handle %s" % wire_type)
 
@@ -428,12 +720,25 @@ class GoWireType(GoStruct):
 class GoArray(GoType):
     """A Go array.
 
-    Go arrays are mapped to Python tuples.
+    Go arrays are mapped to Python tuples. Go arrays have a fixed size
+    and cannot be resized. This makes them more like Python tuples
+    than Python lists.
     """
+    __slots__ = ('typeid', '_loader', '_elem', '_length')
+    kind = ARRAY
+    # Go always sends arrays, even when all elements are zero.
+    omit_zero = False
 
     @property
     def zero(self):
-        return (self._loader.types[self._elem].zero, ) * self._length
+        zero, factory = self._zero_parts()
+        return zero if factory is None else factory()
+
+    def _zero_parts(self):
+        zero, factory = self._loader.types[self._elem]._zero_parts()
+        if factory is None:
+            return (zero, ) * self._length, None
+        return None, lambda: tuple(factory() for i in range(self._length))
 
     def __init__(self, typeid, loader, elem, length):
         """A Go array of a certain type and length.
@@ -448,33 +753,32 @@ class GoArray(GoType):
         self._elem = elem
         self._length = length
 
-    def decode(self, buf):
-        """Decode data from buf and return a tuple.
-
-        Go arrays have a fixed size and cannot be resized. This makes
-        them more like Python tuples than Python lists.
-        """
-        count, buf = GoUint.decode(buf)
-        assert count == self._length, \
-            "expected %d elements, found %d" % (self._length, count)
-
-        result = []
-        for i in range(count):
-            value, buf = self._loader.decode_value(self._elem, buf)
-            result.append(value)
-        return tuple(result), buf
+    def encode(self, values):
+        """Encode a sequence of exactly the array length."""
+        assert len(values) == self._length, \
+            "expected %d elements, found %d" % (self._length, len(values))
+        elem = self._loader.types[self._elem]
+        return GoUint.encode(len(values)) + b''.join(
+            elem.encode(value) for value in values)
 
 
 class GoSlice(GoType):
     """A Go slice.
 
-    Go slices are mapped to Python lists.
+    Go slices are mapped to Python lists. Go slices can extended later
+    (with a possible reallocation of the underlying array) and are
+    thus similar to Python lists.
     """
+    __slots__ = ('typeid', '_loader', '_elem')
+    kind = SLICE
 
     @property
     def zero(cls):
         return []
 
+    def _zero_parts(self):
+        return None, list
+
     def __init__(self, typeid, loader, elem):
         """A Go slice of a certain type.
 
@@ -487,19 +791,11 @@ class GoSlice(GoType):
         self._loader = loader
         self._elem = elem
 
-    def decode(self, buf):
-        """Decode data from buf and return a list.
-
-        Go slices can extended later (with a possible reallocation of
-        the underlying array) and are thus similar to Python lists.
-        """
-        count, buf = GoUint.decode(buf)
-
-        result = []
-        for i in range(count):
-            value, buf = self._loader.decode_value(self._elem, buf)
-            result.append(value)
-        return result, buf
+    def encode(self, values):
+        """Encode a sequence of values."""
+        elem = self._loader.types[self._elem]
+        return GoUint.encode(len(values)) + b''.join(
+            elem.encode(value) for value in values)
 
 
 class GoMap(GoType):
@@ -507,11 +803,16 @@ class GoMap(GoType):
 
     Go maps are mapped to Python dictionaries.
     """
+    __slots__ = ('typeid', '_loader', '_key_typeid', '_elem_typeid')
+    kind = MAP
 
     @property
     def zero(cls):
         return {}
 
+    def _zero_parts(self):
+        return None, dict
+
     def __init__(self, typeid, loader, key_typeid, elem_typeid):
         """A Go map with a certain key and element type.
 
@@ -525,13 +826,27 @@ class GoMap(GoType):
         self._key_typeid = key_typeid
         self._elem_typeid = elem_typeid
 
-    def decode(self, buf):
-        """Decode data from buf and return a dict."""
-        count, buf = GoUint.decode(buf)
+    def encode(self, mapping):
+        """Encode a dict."""
+        key_type = self._loader.types[self._key_typeid]
+        elem_type = self._loader.types[self._elem_typeid]
+        parts = [GoUint.encode(len(mapping))]
+        for key, value in mapping.items():
+            parts.append(key_type.encode(key))
+            parts.append(elem_type.encode(value))
+        return b''.join(parts)
+
 
-        result = {}
-        for i in range(count):
-            key, buf = self._loader.decode_value(self._key_typeid, buf)
-            value, buf = self._loader.decode_value(self._elem_typeid, buf)
-            result[key] = value
-        return result, buf
+def dependencies(go_type):
+    """Return the IDs of the types go_type refers to directly:
+
+    >>> dependencies(GoMap(142, None, INT, STRING))
+    [2, 6]
+    """
+    if isinstance(go_type, GoStruct):
+        return [typeid for (name, typeid) in go_type._fields]
+    if isinstance(go_type, (GoSlice, GoArray)):
+        return [go_type._elem]
+    if isinstance(go_type, GoMap):
+        return [go_type._key_typeid, go_type._elem_typeid]
+    return []
@@ -8,5 +8,5 @@ setup(
     author='Martin Geisler',
     author_email='martin@geisler.net',
     license='MIT',
-    packages=['pygob'],
+    packages=['pygob', 'pygob.rpc'],
     zip_safe=False)
@@ -0,0 +1,95 @@
+import io
+import collections
+
+import pygob
+from pygob.types import GoSlice, INT
+
+
+def test_reuse(points, Point):
+    cache = pygob.TypeCache()
+    first = list(pygob.load_all(points, type_cache=cache))
+    second = list(pygob.load_all(points, type_cache=cache))
+    assert first == second == [Point(0, 0), Point(3, 4)]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert type(first[0]) is type(second[0])
+
+
+def test_writable_buffer(points, Point):
+    cache = pygob.TypeCache()
+    for buf in [bytearray(points), bytearray(points)]:
+        values = list(pygob.load_all(buf, type_cache=cache))
+        assert values == [Point(0, 0), Point(3, 4)]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_bound_to_loader(points):
+    cache = pygob.TypeCache()
+    first = pygob.Loader(type_cache=cache)
+    second = pygob.Loader(type_cache=cache)
+    first.load(points)
+    second.load(points)
+    assert second.types[66]._loader is second
+    assert first.types[66]._loader is first
+
+
+def test_save_and_load(points, Point):
+    cache = pygob.TypeCache()
+    pygob.load(points, type_cache=cache)
+    fp = io.BytesIO()
+    cache.save(fp)
+
+    fp.seek(0)
+    warm = pygob.TypeCache()
+    warm.load(fp)
+    assert len(warm) == 1
+    assert pygob.load(points, type_cache=warm) == Point(0, 0)
+    assert warm.hits == 1
+
+
+def test_value_memo():
+    Status = collections.namedtuple('Status', 'Name Code')
+    dumper = pygob.Dumper()
+    data = b''.join(dumper.dump(Status('ok', code))
+                    for code in [1, 2, 1, 1, 3, 1])
+    memo = pygob.ValueMemo(maxsize=2)
+    values = list(pygob.Loader(memo=memo).load_all(data))
+    assert values == list(pygob.load_all(data))
+    assert values[0] is values[2]
+    # Code 3 pushed out code 2, but not the recently used code 1.
+    assert memo.info() == (3, 3, 2, 2)
+
+
+def test_value_memo_skips_mutable_values():
+    dumper = pygob.Dumper()
+    data = dumper.dump([1, 2]) + dumper.dump([1, 2])
+    memo = pygob.ValueMemo()
+    first, second = pygob.Loader(memo=memo).load_all(data)
+    assert first == second
+    assert first is not second
+    assert len(memo) == 0
+
+
+def test_value_memo_segment_size():
+    data = pygob.dump('x' * 100) * 2
+    memo = pygob.ValueMemo(max_segment_size=10)
+    list(pygob.Loader(memo=memo).load_all(data))
+    assert memo.info().misses == 0
+
+
+def test_value_memo_recursive_mutable_values():
+    # type A struct { Next *B }
+    # type B struct { Tags []int; Back *A }
+    A = collections.namedtuple('A', 'Next')
+    B = collections.namedtuple('B', 'Tags Back')
+    dumper = pygob.Dumper()
+    ints = dumper._compound_type(GoSlice, INT)
+    a = dumper.register(A, [('Next', ints.typeid + 2)])
+    dumper.register(B, [('Tags', ints.typeid), ('Back', a.typeid)])
+    value = A(B([1], None))
+    data = dumper.dump(B([2], value)) + dumper.dump(value) * 2
+    memo = pygob.ValueMemo()
+    b, first, second = pygob.Loader(memo=memo).load_all(data)
+    assert first == second == value
+    first.Next.Tags.append(3)
+    assert second.Next.Tags == [1]
+    assert len(memo) == 0
@@ -0,0 +1,60 @@
+import gzip
+import collections
+
+import pytest
+
+import pygob
+from pygob.catalog import Catalog, catalog_file
+from pygob.__main__ import main
+
+Point = collections.namedtuple('Point', 'X Y')
+
+
+def stream():
+    dumper = pygob.Dumper()
+    values = [Point(i, i * 1000) for i in range(100)] + [[1, 2], 'x']
+    return b''.join(dumper.dump(value) for value in values)
+
+
+def test_catalog():
+    catalog = Catalog()
+    catalog.scan(stream())
+    assert catalog.defined == [65, 66]
+    assert catalog.counts == {65: 100, 66: 1, 6: 1}
+    # The type definitions take up 45 bytes.
+    assert sum(catalog.bytes.values()) == len(stream()) - 45
+    assert catalog.describe(65) == 'struct Point {X int, Y int}'
+    assert catalog.describe(66) == '[]int'
+    assert catalog.percentiles(65) == [11, 12, 12, 12]
+    # Point(0, 0) is sent without any fields.
+    assert catalog.percentile(65, 1) == 4
+
+
+def test_percentiles():
+    catalog = Catalog()
+    catalog.sizes[2].extend(range(1, 101))
+    assert catalog.percentiles(2, [1, 50, 99, 100]) == [1, 50, 99, 100]
+    assert catalog.percentile(3, 50) == 0
+
+
+@pytest.mark.parametrize('compress', [bytes, gzip.compress])
+def test_catalog_file(tmpdir, compress):
+    path = tmpdir.join('points.gob')
+    path.write_binary(compress(stream()))
+    catalog = catalog_file(str(path))
+    assert catalog.counts[65] == 100
+
+
+def test_empty_file(tmpdir):
+    path = tmpdir.join('empty.gob')
+    path.write_binary(b'')
+    assert catalog_file(str(path)).counts == {}
+
+
+def test_cli(tmpdir, capsys):
+    path = tmpdir.join('points.gob')
+    path.write_binary(stream())
+    main(['stat', str(path)])
+    out = capsys.readouterr().out
+    assert 'struct Point {X int, Y int}' in out
+    assert 'total: 102 values' in out
@@ -0,0 +1,47 @@
+import pytest
+
+import pygob
+
+
+def decode_chunks(data, size):
+    decoder = pygob.Decoder()
+    result = []
+    for i in range(0, len(data), size):
+        result.extend(decoder.feed(data[i:i + size]))
+    decoder.close()
+    return result
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 100])
+def test_chunks(size, points, Point):
+    # Followed by the int 128.
+    data = points + bytes([5, 4, 0, 254, 1, 0])
+    expected = [Point(0, 0), Point(3, 4), 128]
+    assert decode_chunks(data, size) == expected
+
+
+def test_string_type():
+    decoder = pygob.Decoder()
+    assert list(decoder.feed(bytes([6, 12, 0, 3, 97, 98, 99]))) == [b'abc']
+
+
+def test_long_length_prefix():
+    data = pygob.dump(b'x' * 300)
+    assert data[0] >= 128
+    assert decode_chunks(data, 1) == [b'x' * 300]
+
+
+def test_compaction():
+    framer = pygob.Framer()
+    for i in range(100):
+        assert list(framer.feed(bytes([3, 4, 0, 2]))) == [bytes([4, 0, 2])]
+    assert framer.pending == 0
+    assert len(framer._buffer) < 8
+
+
+def test_truncated():
+    decoder = pygob.Decoder()
+    assert list(decoder.feed(bytes([3, 4, 0]))) == []
+    with pytest.raises(AssertionError) as excinfo:
+        decoder.close()
+    excinfo.match('truncated segment')
@@ -1,6 +1,9 @@
+import collections
+
 import pytest
 
 import pygob
+from pygob.types import INT, STRING
 
 
 @pytest.mark.parametrize(('value', 'encoded'), [
@@ -68,3 +71,68 @@ def test_str(value, encoded):
 ])
 def test_complex(value, encoded):
     assert pygob.dump(value) == bytes(encoded)
+
+
+Point = collections.namedtuple('Point', ['X', 'Y'])
+
+
+def test_struct():
+    # The type definition matches the one sent by Go, except for the
+    # type ID.
+    assert list(pygob.dump(Point(3, 4))) == [
+        31, 255, 129, 3, 1, 1, 5, 80, 111, 105, 110, 116, 1, 255, 130, 0, 1,
+        2, 1, 1, 88, 1, 4, 0, 1, 1, 89, 1, 4, 0, 0, 0, 7, 255, 130, 1, 6, 1, 8,
+        0
+    ]
+
+
+def test_type_sent_once():
+    dumper = pygob.Dumper()
+    first = dumper.dump(Point(3, 4))
+    second = dumper.dump(Point(5, 6))
+    assert len(second) == 8
+    assert list(pygob.load_all(first + second)) == [Point(3, 4), Point(5, 6)]
+
+
+@pytest.mark.parametrize('value', [
+    [1, 2, 3],
+    (1.5, 2.5),
+    {7: [True]},
+    [Point(1, 2), Point(3, 4)],
+])
+def test_compound_round_trip(value):
+    assert pygob.load(pygob.dump(value)) == value
+
+
+def test_cannot_infer_empty():
+    with pytest.raises(NotImplementedError):
+        pygob.dump([])
+
+
+def test_failed_dump_sends_nothing():
+    dumper = pygob.Dumper()
+    dumper.register(Point, [('X', INT), ('Y', STRING)])
+    with pytest.raises(TypeError):
+        dumper.dump(Point(1, 2))
+    data = dumper.dump(Point(1, 'a'))
+    assert pygob.load(data) == Point(1, b'a')
+
+
+def test_zero_fields_omitted():
+    dumper = pygob.Dumper()
+    dumper.dump(Point(1, 1))
+    # Only the delta to Y and its value are sent, like Go does.
+    assert list(dumper.dump(Point(0, 4))) == [5, 255, 130, 2, 8, 0]
+    assert list(dumper.dump(Point(0, 0))) == [3, 255, 130, 0]
+
+
+def test_zero_compound_fields():
+    Item = collections.namedtuple('Item', 'Name Tags Pos Meta')
+    dumper = pygob.Dumper()
+    pos = dumper.typeid((0, 0))
+    dumper.register(Item, [('Name', STRING), ('Tags', dumper.typeid(['a'])),
+                           ('Pos', pos), ('Meta', dumper.typeid({'a': 1}))])
+    data = dumper.dump(Item('', [], (0, 0), {}))
+    # Arrays are always sent.
+    assert pygob.load(data) == Item(b'', [], (0, 0), {})
+    assert data.endswith(bytes([3, 2, 0, 0, 0]))
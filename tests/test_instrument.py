@@ -0,0 +1,105 @@
+import io
+
+import pytest
+
+import pygob
+from pygob.transcode import Transcoder
+from pygob.types import GoInt
+
+# The int 1 sent as a singleton.
+ONE = bytes([3, 4, 0, 2])
+
+
+def test_loader_stats(points):
+    stats = pygob.Stats()
+    loader = pygob.Loader(stats=stats)
+    values = list(loader.load_all(points + ONE))
+    assert len(values) == 3
+
+    snapshot = stats.snapshot()
+    assert snapshot['values'][66]['count'] == 2
+    assert snapshot['values'][66]['bytes'] == 1 + 5
+    assert snapshot['values'][2]['count'] == 1
+    assert snapshot['types'] == [(66, '<GoStruct Point X=2, Y=2>')]
+    assert snapshot['segment_sizes'] == {4: 2, 8: 1, 32: 1}
+
+
+def load_all(loader, data):
+    return list(loader.load_all(data))
+
+
+def decoder(loader, data):
+    decoder = pygob.Decoder(loader)
+    values = list(decoder.feed(data))
+    decoder.close()
+    return values
+
+
+def load_stream(loader, data):
+    return list(pygob.load_stream(io.BytesIO(data), loader=loader))
+
+
+def snapshot(loader, data):
+    # Types are registered by the loader, values decoded by a snapshot.
+    segments = list(pygob.Framer().feed(data))
+    values = [s for s in segments if GoInt.decode_at(s, 0)[0] > 0]
+    for segment in segments[:-len(values)]:
+        loader._load_segment(segment)
+    return list(loader.freeze().decode_messages(values))
+
+
+def transcoder(loader, data):
+    return Transcoder('ndjson', loader).feed(data).splitlines()
+
+
+@pytest.mark.parametrize('decode', [load_all, decoder, load_stream,
+                                    snapshot, transcoder])
+def test_same_stats_on_all_paths(decode, points):
+    stats = pygob.Stats()
+    assert len(decode(pygob.Loader(stats=stats), points + ONE)) == 3
+    snapshot = stats.snapshot()
+    assert snapshot['segment_sizes'] == {4: 2, 8: 1, 32: 1}
+    assert {typeid: (values['count'], values['bytes'])
+            for typeid, values in snapshot['values'].items()} == {
+                66: (2, 1 + 5), 2: (1, 2)}
+    assert snapshot['types'] == [(66, '<GoStruct Point X=2, Y=2>')]
+
+
+def test_load_columns_stats(points):
+    stats = pygob.Stats()
+    columns = pygob.Loader(stats=stats).load_columns(points)
+    assert len(columns['X']) == 2
+    snapshot = stats.snapshot()
+    assert snapshot['segment_sizes'] == {4: 1, 8: 1, 32: 1}
+    assert snapshot['values'][66]['count'] == 2
+    assert snapshot['values'][66]['bytes'] == 1 + 5
+
+
+def test_dumper_stats():
+    stats = pygob.Stats()
+    dumper = pygob.Dumper(stats=stats)
+    dumper.dump(1)
+    dumper.dump(2)
+    dumper.dump('hello')
+    snapshot = stats.snapshot()
+    assert snapshot['values'][2]['count'] == 2
+    assert snapshot['values'][2]['bytes'] == 4
+    assert snapshot['values'][6]['count'] == 1
+
+
+def test_dumper_and_loader_agree(Point):
+    dumper_stats = pygob.Stats()
+    dumper = pygob.Dumper(stats=dumper_stats)
+    data = b''.join(dumper.dump(v) for v in [Point(1, 2), 300, 'hello'])
+    loader_stats = pygob.Stats()
+    list(pygob.Loader(stats=loader_stats).load_all(data))
+    dumped = dumper_stats.snapshot()
+    loaded = loader_stats.snapshot()
+    assert dumped['segment_sizes'] == loaded['segment_sizes']
+    for typeid, counters in loaded['values'].items():
+        assert dumped['values'][typeid]['bytes'] == counters['bytes']
+
+
+def test_disabled_by_default():
+    loader = pygob.Loader()
+    assert '_decode_segment' not in vars(loader)
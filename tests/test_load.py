@@ -4,6 +4,8 @@ import collections
 import pytest
 
 import pygob
+from pygob.types import (GoInt, GoUint, GoStruct, GoSlice, INT, STRING,
+                         BYTE_SLICE, FIRST_CUSTOM_TYPE)
 
 
 @pytest.mark.parametrize(('data', 'expected'), [
@@ -196,3 +198,105 @@ def test_person_struct():
     Address = collections.namedtuple('Address', ['Street', 'HouseNumber'])
     assert pygob.load(bytes(data)) == Person(b'Alice', 35,
                                              Address(b'Main St', 17))
+
+
+def test_deeply_nested_struct():
+    # type Node struct { Value int; Next *Node }
+    Node = collections.namedtuple('Node', ['Value', 'Next'])
+    dumper = pygob.Dumper()
+    dumper.register(Node, [('Value', INT), ('Next', FIRST_CUSTOM_TYPE)])
+    data = dumper.dump(Node(1, None))
+
+    # Nest much deeper than the recursion limit.
+    depth = 10000
+    segment = (GoInt.encode(FIRST_CUSTOM_TYPE) + bytes([1, 2, 1]) * depth +
+               bytes([1, 2, 0]) + bytes([0]) * depth)
+    data += GoUint.encode(len(segment)) + segment
+
+    first, node = pygob.load_all(data)
+    assert first == Node(1, None)
+    for i in range(depth):
+        assert node.Value == 1
+        node = node.Next
+    assert node == Node(1, None)
+
+
+def test_zero_values_are_not_shared():
+    Point = collections.namedtuple('Point', ['X', 'Y'])
+    dumper = pygob.Dumper()
+    data = b''.join(dumper.dump(p) for p in [
+        Point(1, [2]),
+        Point(3, None),
+        Point(4, None),
+    ])
+    first, second, third = pygob.load_all(data)
+    assert second.Y == third.Y == []
+    assert second.Y is not third.Y
+
+
+def test_type_table():
+    loader = pygob.Loader()
+    assert loader.get_type(INT) is GoInt
+    assert loader.get_type(FIRST_CUSTOM_TYPE) is None
+    loader.add_type(1000, GoUint)
+    assert len(loader.types) == 1001
+    assert loader.get_type(1000) is GoUint
+    assert loader.get_type(999) is None
+
+
+def test_unknown_type():
+    with pytest.raises(NotImplementedError):
+        pygob.load(GoUint.encode(3) + GoInt.encode(FIRST_CUSTOM_TYPE) +
+                   bytes([0, 2]))
+
+
+@pytest.mark.parametrize(('value', 'expected'), [
+    ([0, 1, -1, 127, -128, 2 ** 40, -2 ** 63, 2 ** 63 - 1], None),
+    ((5, -5, 1000), None),
+    ([b'', b'x', b'y' * 300], None),
+    ({'a': 'b', 'c' * 200: ''}, {b'a': b'b', b'c' * 200: b''}),
+    ({'a': -1, 'b': 2 ** 40}, {b'a': -1, b'b': 2 ** 40}),
+    ({1: 1.5, -2: 2.5}, None),
+    ([[1, 2], [], [3]], None),
+    ([{'a': [1]}, {}], [{b'a': [1]}, {}]),
+])
+def test_container_fast_paths(value, expected):
+    if expected is None:
+        expected = value
+    assert pygob.load(pygob.dump(value)) == expected
+
+
+def test_slice_of_flat_structs():
+    Item = collections.namedtuple('Item', 'Name Data Count')
+    dumper = pygob.Dumper()
+    dumper.register(Item, [('Name', STRING), ('Data', BYTE_SLICE),
+                           ('Count', INT)])
+    items = [Item(b'a', bytearray(b'x'), 1), Item(b'', bytearray(), 0),
+             Item(b'', bytearray(), 0)]
+    values = pygob.load(dumper.dump(items))
+    assert values == items
+    # Missing byte slices get a zero value of their own.
+    assert values[1].Data is not values[2].Data
+
+
+def mutually_recursive_types():
+    # type A struct { Next *B }
+    # type B struct { Tags []int; Back *A }
+    loader = pygob.Loader()
+    a = GoStruct(65, 'A', loader, [('Next', 66)])
+    b = GoStruct(66, 'B', loader, [('Tags', 67), ('Back', 65)])
+    loader.add_type(65, a)
+    loader.add_type(66, b)
+    loader.add_type(67, GoSlice(67, loader, INT))
+    return a, b
+
+
+@pytest.mark.parametrize('a_first', [True, False])
+def test_recursive_zero_values_do_not_depend_on_order(a_first):
+    a, b = mutually_recursive_types()
+    if a_first:
+        a_zero, b_zero = a.zero, b.zero
+    else:
+        b_zero, a_zero = b.zero, a.zero
+    assert a_zero == a._class(None)
+    assert b_zero == b._class([], None)
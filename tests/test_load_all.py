@@ -3,6 +3,8 @@ import collections
 import pytest
 
 import pygob
+import pygob.engine
+from pygob.types import GoInt, GoUint, INT, FIRST_CUSTOM_TYPE
 
 
 def load_all(data):
@@ -36,3 +38,88 @@ def test_iterator():
     assert next(seq) == 3
     with pytest.raises(StopIteration):
         next(seq)
+
+
+Trade = collections.namedtuple('Trade', ['Symbol', 'Price', 'Tags', 'Qty'])
+
+
+def trades():
+    dumper = pygob.Dumper()
+    return b''.join(dumper.dump(t) for t in [
+        Trade('AAPL', 1.5, ['a'], 10),
+        Trade('GOOG', 2.5, ['b', 'c'], 0),
+        Trade('AAPL', 3.5, ['d'], 30),
+    ] + [42])
+
+
+def test_where_dict():
+    result = list(pygob.load_all(trades(), where={'Symbol': b'AAPL'}))
+    assert [t.Price for t in result] == [1.5, 3.5]
+
+
+def test_where_callable():
+    result = list(pygob.load_all(trades(), where=lambda Price: Price > 2))
+    assert [t.Symbol for t in result] == [b'GOOG', b'AAPL']
+
+
+def test_where_skips_compound_fields(monkeypatch):
+    built = []
+    strings_at = pygob.engine._strings_at
+
+    def record_strings_at(buf, pos, count):
+        built.append(count)
+        return strings_at(buf, pos, count)
+
+    monkeypatch.setattr(pygob.engine, '_strings_at', record_strings_at)
+    result = list(pygob.load_all(trades(), where=lambda Qty: Qty > 5))
+    assert [t.Tags for t in result] == [[b'a'], [b'd']]
+    # Only the tags of the matching trades are built.
+    assert built == [1, 1]
+
+
+@pytest.mark.parametrize('value', [
+    [[1, 2], [], [3]],
+    {'a': [1.5], 'b': []},
+    {1: {'x': [b'y']}},
+    (Trade('A', 1.0, ['b'], 2), Trade('', 0.0, [], 0)),
+])
+def test_skip_at(value):
+    loader = pygob.Loader()
+    buf = pygob.Dumper().dump(value)
+    segments = []
+    while buf:
+        segment, buf = loader._read_segment(buf)
+        segments.append(segment)
+    for segment in segments[:-1]:
+        loader._load_segment(segment)
+    typeid, pos = GoInt.decode_at(segments[-1], 0)
+    go_type = loader.get_type(typeid)
+    # Top-level values which are not structs start with a zero byte.
+    pos += 1
+    assert go_type.skip_at(segments[-1], pos) == len(segments[-1])
+
+
+def test_skip_deep_value():
+    # type Node struct { Next *Node; Value int }
+    Node = collections.namedtuple('Node', ['Next', 'Value'])
+    dumper = pygob.Dumper()
+    dumper.register(Node, [('Next', FIRST_CUSTOM_TYPE), ('Value', INT)])
+    data = dumper.dump(Node(None, 2))
+
+    # The Next fields before Value nest much deeper than the recursion
+    # limit and are skipped.
+    depth = 10000
+    segment = (GoInt.encode(FIRST_CUSTOM_TYPE) + bytes([1]) * depth +
+               bytes([2, 2, 0]) + bytes([1, 2, 0]) * depth)
+    data += GoUint.encode(len(segment)) + segment
+    assert list(pygob.load_all(data, where={'Value': 2})) == [Node(None, 2)]
+
+
+def test_where_recursive_field():
+    # type Node struct { Value int; Next *Node }
+    Node = collections.namedtuple('Node', ['Value', 'Next'])
+    dumper = pygob.Dumper()
+    dumper.register(Node, [('Value', INT), ('Next', FIRST_CUSTOM_TYPE)])
+    data = dumper.dump(Node(1, Node(2, None))) + dumper.dump(Node(3, None))
+    assert list(pygob.load_all(data, where={'Next': None})) == [
+        Node(3, None)]
@@ -0,0 +1,66 @@
+import array
+import collections
+
+import pytest
+
+import pygob
+from pygob.types import INT
+
+
+def test_point_columns(points):
+    # Point{0, 0}, Point{3, 4} and Point{0, 5}.
+    columns = pygob.load_columns(points + bytes([5, 255, 132, 2, 10, 0]))
+    assert list(columns) == ['X', 'Y']
+    assert columns['X'] == array.array('q', [0, 3, 0])
+    assert columns['Y'] == array.array('q', [0, 4, 5])
+
+
+def test_person_columns():
+    data = [
+        50, 255, 149, 3, 1, 1, 6, 80, 101, 114, 115, 111, 110, 1, 255, 150, 0,
+        1, 3, 1, 4, 78, 97, 109, 101, 1, 12, 0, 1, 3, 65, 103, 101, 1, 4, 0, 1,
+        7, 65, 100, 100, 114, 101, 115, 115, 1, 255, 152, 0, 0, 0, 48, 255,
+        151, 3, 1, 1, 7, 65, 100, 100, 114, 101, 115, 115, 1, 255, 152, 0, 1,
+        2, 1, 6, 83, 116, 114, 101, 101, 116, 1, 12, 0, 1, 11, 72, 111, 117,
+        115, 101, 78, 117, 109, 98, 101, 114, 1, 4, 0, 0, 0, 25, 255, 150, 1,
+        5, 65, 108, 105, 99, 101, 1, 70, 1, 1, 7, 77, 97, 105, 110, 32, 83,
+        116, 1, 34, 0, 0
+    ]
+    columns = pygob.load_columns(bytes(data))
+    assert columns['Name'] == [b'Alice']
+    assert columns['Age'] == array.array('q', [35])
+    assert [tuple(a) for a in columns['Address']] == [(b'Main St', 17)]
+
+
+def test_empty_stream():
+    assert pygob.load_columns(b'') == {}
+
+
+def test_not_a_struct():
+    with pytest.raises(ValueError):
+        pygob.load_columns(bytes([3, 4, 0, 2]))
+
+
+def test_buffer_types(points):
+    for buf in [bytearray(points), memoryview(points)]:
+        columns = pygob.load_columns(buf)
+        assert columns['Y'] == array.array('q', [0, 4])
+
+
+def test_recursive_struct():
+    # type Node struct { Value int; Next *Node; Tags []int }
+    Node = collections.namedtuple('Node', ['Value', 'Next', 'Tags'])
+    dumper = pygob.Dumper()
+    tags = dumper.typeid([1])
+    dumper.register(Node, [('Value', INT), ('Next', tags + 1),
+                           ('Tags', tags)])
+    data = b''.join(dumper.dump(node) for node in [
+        Node(1, Node(2, None, [3]), None),
+        Node(4, None, None),
+    ])
+    columns = pygob.load_columns(data)
+    # Omitted fields get the same zero values as with load_all.
+    assert columns['Next'] == [node.Next for node in pygob.load_all(data)]
+    assert columns['Next'] == [(2, None, [3]), None]
+    assert columns['Tags'] == [[], []]
+    assert columns['Tags'][0] is not columns['Tags'][1]
@@ -0,0 +1,103 @@
+import io
+import gzip
+import collections
+
+import pytest
+
+import pygob
+from pygob.router import MessageReader, MessageWriter, route
+
+Point = collections.namedtuple('Point', 'X Y')
+Line = collections.namedtuple('Line', 'From To')
+
+
+def stream():
+    dumper = pygob.Dumper()
+    return b''.join(dumper.dump(value) for value in [
+        Point(1, 2),
+        Line(Point(0, 0), Point(3, 4)),
+        'note',
+        Point(5, 6),
+        Line(Point(1, 1), Point(2, 2)),
+    ])
+
+
+def test_messages():
+    reader = MessageReader()
+    messages = list(reader.feed(stream()))
+    reader.close()
+    assert len(messages) == 5
+    assert [reader.name(m.typeid) for m in messages] == [
+        'Point', 'Line', None, 'Point', 'Line']
+    line = messages[1].typeid
+    point = messages[0].typeid
+    assert reader.dependencies(line) == [point, line]
+
+
+def test_route():
+    points = io.BytesIO()
+    lines = io.BytesIO()
+    other = io.BytesIO()
+    counts = route(io.BytesIO(stream()), {'Point': points, 'Line': lines},
+                   default=other)
+    assert counts == {'Point': 2, 'Line': 2, None: 1}
+    assert list(pygob.load_all(points.getvalue())) == [
+        Point(1, 2), Point(5, 6)]
+    assert list(pygob.load_all(lines.getvalue())) == [
+        Line(Point(0, 0), Point(3, 4)), Line(Point(1, 1), Point(2, 2))]
+    assert list(pygob.load_all(other.getvalue())) == [b'note']
+
+
+def test_definitions_written_once():
+    reader = MessageReader()
+    out = io.BytesIO()
+    writer = MessageWriter(out, reader)
+    for message in reader.feed(stream()):
+        writer.write(message)
+    # Without dropping anything, the stream is copied verbatim.
+    assert out.getvalue() == stream()
+
+
+def test_compressed_input():
+    lines = io.BytesIO()
+    route(io.BytesIO(gzip.compress(stream())), {'Line': lines})
+    assert len(list(pygob.load_all(lines.getvalue()))) == 2
+
+
+def test_undefined_type():
+    reader = MessageReader()
+    with pytest.raises(ValueError):
+        reader.dependencies(100)
+
+
+def test_merge_remaps_types():
+    first = pygob.Dumper()
+    second = pygob.Dumper()
+    a = first.dump(Point(1, 2)) + first.dump([Point(3, 4)])
+    b = second.dump(Line(Point(0, 0), Point(1, 1))) + second.dump(Point(5, 6))
+    out = io.BytesIO()
+    assert pygob.merge([io.BytesIO(a), io.BytesIO(b)], out) == 4
+    assert list(pygob.load_all(out.getvalue())) == [
+        Point(1, 2), [Point(3, 4)], Line(Point(0, 0), Point(1, 1)),
+        Point(5, 6)]
+
+
+def test_merge_deduplicates_types():
+    out = io.BytesIO()
+    pygob.merge([io.BytesIO(stream()), io.BytesIO(stream())], out)
+    reader = MessageReader()
+    messages = list(reader.feed(out.getvalue()))
+    assert len(messages) == 10
+    # Point and Line are defined once.
+    assert len(reader._definitions) == 2
+    assert list(pygob.load_all(out.getvalue())) == (
+        list(pygob.load_all(stream())) * 2)
+
+
+def test_merge_interface():
+    dumper = pygob.Dumper()
+    go_type = pygob.types.GoStruct(65, 'Event', dumper._loader,
+                                   [('Payload', pygob.types.INTERFACE)])
+    data = dumper._define(go_type) + bytes([3, 255, 130, 0])
+    with pytest.raises(NotImplementedError):
+        pygob.merge([io.BytesIO(data)], io.BytesIO())
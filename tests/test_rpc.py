@@ -0,0 +1,109 @@
+import collections
+import threading
+
+import pytest
+
+from pygob import rpc
+
+Args = collections.namedtuple('Args', ['A', 'B'])
+Quotient = collections.namedtuple('Quotient', ['Quo', 'Rem'])
+
+
+class Arith:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def Multiply(self, args):
+        return args.A * args.B
+
+    def Divide(self, args):
+        if args.B == 0:
+            raise ZeroDivisionError('divide by zero')
+        return Quotient(args.A // args.B, args.A % args.B)
+
+    def Wait(self, args):
+        self.release.wait(5)
+        return args
+
+
+@pytest.fixture
+def arith():
+    return Arith()
+
+
+@pytest.fixture
+def address(arith):
+    server = rpc.Server()
+    server.register(arith)
+    yield server.listen()
+    arith.release.set()
+    server.close()
+
+
+def test_call(address):
+    with rpc.Client.connect(address) as client:
+        assert client.call('Arith.Multiply', Args(7, 8)) == 56
+        assert client.call('Arith.Divide', Args(17, 5)) == (3, 2)
+
+
+def test_error(address):
+    with rpc.Client.connect(address) as client:
+        with pytest.raises(rpc.ServerError) as excinfo:
+            client.call('Arith.Divide', Args(1, 0))
+        excinfo.match('divide by zero')
+        # The connection is still usable after an error.
+        assert client.call('Arith.Multiply', Args(2, 3)) == 6
+
+
+@pytest.mark.parametrize(('method', 'message'), [
+    ('Arith', 'ill-formed'),
+    ('Nope.Multiply', "can't find service"),
+    ('Arith.Nope', "can't find method"),
+    ('Arith._lookup', "can't find method"),
+])
+def test_unknown_method(address, method, message):
+    with rpc.Client.connect(address) as client:
+        with pytest.raises(rpc.ServerError) as excinfo:
+            client.call(method, Args(1, 2))
+        excinfo.match(message)
+
+
+def test_pipelining(address, arith):
+    with rpc.Client.connect(address) as client:
+        slow = client.go('Arith.Wait', 'slow')
+        fast = [client.go('Arith.Multiply', Args(i, i)) for i in range(50)]
+        assert [f.result(5) for f in fast] == [i * i for i in range(50)]
+        assert not slow.done()
+        arith.release.set()
+        assert slow.result(5) == b'slow'
+
+
+def test_close_fails_pending(address):
+    client = rpc.Client.connect(address)
+    future = client.go('Arith.Wait', 1)
+    client.close()
+    with pytest.raises(rpc.ShutdownError):
+        future.result(5)
+    with pytest.raises(rpc.ShutdownError):
+        client.go('Arith.Multiply', Args(1, 2))
+
+
+def test_unencodable_args(address):
+    with rpc.Client.connect(address) as client:
+        for i in range(2):
+            with pytest.raises(NotImplementedError):
+                client.go('Arith.Multiply', [])
+        assert client.pending == 0
+        assert client.call('Arith.Multiply', Args(2, 3)) == 6
+
+
+def test_pool(address, arith):
+    with rpc.ClientPool(size=2) as pool:
+        first = pool.client(address)
+        assert pool.client(address) is first
+        waiting = pool.go(address, 'Arith.Wait', 1)
+        second = pool.client(address)
+        assert second is not first
+        assert pool.call(address, 'Arith.Multiply', Args(3, 4)) == 12
+        arith.release.set()
+        assert waiting.result(5) == 1
@@ -0,0 +1,42 @@
+import asyncio
+import collections
+
+import pytest
+
+from pygob import rpc
+
+Args = collections.namedtuple('Args', ['A', 'B'])
+
+
+class Arith:
+    def Multiply(self, args):
+        return args.A * args.B
+
+    def Divide(self, args):
+        return args.A // args.B
+
+
+@pytest.fixture
+def address():
+    server = rpc.Server()
+    server.register(Arith())
+    yield server.listen()
+    server.close()
+
+
+def test_async_client(address):
+    async def main():
+        client = await rpc.AsyncClient.connect(*address)
+        async with client:
+            calls = [client.call('Arith.Multiply', Args(i, 2))
+                     for i in range(20)]
+            results = await asyncio.gather(*calls)
+            assert results == [i * 2 for i in range(20)]
+            with pytest.raises(rpc.ServerError):
+                await client.call('Arith.Divide', Args(1, 0))
+            with pytest.raises(NotImplementedError):
+                await client.call('Arith.Multiply', [])
+            assert client._pending == {}
+            assert await client.call('Arith.Multiply', Args(2, 3)) == 6
+
+    asyncio.get_event_loop().run_until_complete(main())
@@ -0,0 +1,157 @@
+import types
+import collections
+
+import pytest
+
+import pygob
+from pygob import schema
+from pygob.__main__ import main
+from pygob.types import GoInt, GoUint, INT, STRING, FIRST_CUSTOM_TYPE
+
+DECLARATIONS = '''
+package example
+
+// An address.
+type Address struct {
+    Street      string `json:"street"`
+    HouseNumber int
+}
+
+type Tags []string
+
+type Person struct {
+    Name    string
+    Age     int
+    Address *Address
+    Tags    Tags
+    Scores  map[string]float64
+    Pos     [2]int
+    secret  int
+}
+'''
+
+Address = collections.namedtuple('Address', 'Street HouseNumber')
+Person = collections.namedtuple(
+    'Person', 'Name Age Address Tags Scores Pos')
+
+
+def compile_module(source):
+    module = types.ModuleType('compiled')
+    exec(source, module.__dict__)
+    return module
+
+
+def people():
+    dumper = pygob.Dumper()
+    address = dumper.register(Address, [('Street', STRING),
+                                        ('HouseNumber', INT)])
+    tags = dumper.typeid(['tag'])
+    scores = dumper.typeid({'a': 1.5})
+    pos = dumper.typeid((1, 2))
+    dumper.register(Person, [
+        ('Name', STRING), ('Age', INT), ('Address', address.typeid),
+        ('Tags', tags), ('Scores', scores), ('Pos', pos),
+    ])
+    alice = Person('Alice', 35, Address('Main St', 17), ['x', 'y'],
+                   {'a': 1.5}, (1, 2))
+    bob = Person('Bob', 0, Address('', 0), [], {}, (0, 0))
+    return dumper.dump(alice) + dumper.dump(bob)
+
+
+def test_parse_go():
+    address, person = schema.parse_go(DECLARATIONS)
+    assert address._fields == [('Street', STRING), ('HouseNumber', INT)]
+    assert [name for (name, typeid) in person._fields] == list(Person._fields)
+
+
+def test_compiled_decoding():
+    module = compile_module(schema.generate(schema.parse_go(DECLARATIONS)))
+    data = people()
+    loader = pygob.Loader(schema=module.SCHEMA)
+    values = list(loader.load_all(data))
+    assert values == list(pygob.load_all(data))
+    assert type(values[0]) is module.Person
+    assert isinstance(loader.types[69], schema.CompiledStruct)
+
+
+def test_compiled_encoding():
+    module = compile_module(schema.generate(schema.parse_go(DECLARATIONS)))
+    value = Person(b'Alice', 35, Address(b'Main St', 0), [], {b'a': 1.5},
+                   (0, 0))
+    encoded = module.encode_Person(value)
+    assert module.decode_Person(encoded, 0) == (value, len(encoded))
+
+
+def test_from_gob():
+    module = compile_module(schema.generate(schema.parse_gob(people())))
+    loader = pygob.Loader(schema=module.SCHEMA)
+    assert list(loader.load_all(people())) == list(pygob.load_all(people()))
+
+
+def test_mismatch():
+    module = compile_module(schema.generate(schema.parse_go(
+        'type Address struct { Street string; Zip int }')))
+    data = people()
+    loader = pygob.Loader(schema=module.SCHEMA)
+    assert list(loader.load_all(data)) == list(pygob.load_all(data))
+    assert not isinstance(loader.types[65], schema.CompiledStruct)
+
+
+def test_recursive():
+    # Compiled decoders call each other for nested values, which would
+    # hit the recursion limit on long chains.
+    structs = schema.parse_go('''
+        type List struct { Head *Node }
+        type Node struct { Value int; Next *Node }
+    ''')
+    module = compile_module(schema.generate(structs))
+    assert module.SCHEMA._types == {}
+    node = structs[1]
+    compiled = schema.Schema({'Node': (schema.signature(node), None,
+                                       None, None)})
+    assert compiled.match(node) is None
+
+    Node = collections.namedtuple('Node', 'Value Next')
+    dumper = pygob.Dumper()
+    dumper.register(Node, [('Value', INT), ('Next', FIRST_CUSTOM_TYPE)])
+    data = dumper.dump(Node(1, None))
+    depth = 5000
+    segment = (GoInt.encode(FIRST_CUSTOM_TYPE) + bytes([1, 2, 1]) * depth +
+               bytes([1, 2, 0]) + bytes([0]) * depth)
+    data += GoUint.encode(len(segment)) + segment
+    loader = pygob.Loader(schema=compiled)
+    first, node = loader.load_all(data)
+    for i in range(depth):
+        node = node.Next
+    assert node == Node(1, None)
+
+
+def test_struct_names_shadowing_imports():
+    structs = schema.parse_go('''
+        type Schema struct { A int }
+        type collections struct { B int }
+    ''')
+    module = compile_module(schema.generate(structs))
+    assert isinstance(module.SCHEMA, schema.Schema)
+    dumper = pygob.Dumper()
+    dumper.register(module.Schema, [('A', INT)])
+    data = dumper.dump(module.Schema(3))
+    loader = pygob.Loader(schema=module.SCHEMA)
+    assert list(loader.load_all(data)) == [module.Schema(3)]
+    assert isinstance(loader.types[65], schema.CompiledStruct)
+
+
+def test_unsupported():
+    with pytest.raises(NotImplementedError):
+        schema.parse_go('type Event struct { Payload interface{} }')
+    with pytest.raises(NotImplementedError):
+        schema.parse_go('type Event struct { When time.Time }')
+
+
+def test_cli(tmpdir):
+    src = tmpdir.join('types.go')
+    src.write(DECLARATIONS)
+    dst = tmpdir.join('types_gob.py')
+    main(['compile', str(src), str(dst)])
+    module = compile_module(dst.read())
+    assert sorted(module.SCHEMA._types) == ['Address', 'Person']
@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import pygob
+
+
+def split(buf):
+    return list(pygob.Framer().feed(buf))
+
+
+def test_decode_messages(points, Point):
+    loader = pygob.Loader()
+    rest = loader.load_types(points)
+    snapshot = loader.freeze()
+    segments = split(rest) * 100
+    with ThreadPoolExecutor(4) as executor:
+        values = list(snapshot.decode_messages(segments, executor))
+    assert values == [Point(0, 0), Point(3, 4)] * 100
+    assert list(snapshot.decode_messages(segments[:2])) == values[:2]
+
+
+def test_independent_of_loader(points):
+    loader = pygob.Loader()
+    loader.load_types(points)
+    snapshot = loader.freeze()
+    assert snapshot.types[66]._loader is snapshot
+    assert loader.types[66]._loader is loader
+
+
+def test_immutable(points):
+    snapshot = pygob.Loader().freeze()
+    with pytest.raises(TypeError):
+        snapshot.types[66] = None
+    with pytest.raises(ValueError):
+        snapshot.decode_message(split(points)[0])
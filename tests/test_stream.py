@@ -0,0 +1,89 @@
+import io
+import gzip
+
+import pytest
+
+import pygob
+import pygob.stream
+
+VALUES = [17, 'hello', 3.5, b'\x00' * 100, True] * 200
+
+
+def write(compression, block_size=1024):
+    fp = io.BytesIO()
+    with pygob.StreamWriter(fp, compression, block_size) as writer:
+        for value in VALUES:
+            writer.dump(value)
+    return fp.getvalue()
+
+
+def read(data, compression='auto', chunk_size=7):
+    fp = io.BytesIO(data)
+    return list(pygob.load_stream(fp, compression, chunk_size))
+
+
+def expected():
+    return [value.encode() if isinstance(value, str) else value
+            for value in VALUES]
+
+
+@pytest.mark.parametrize('compression', [None, 'zlib', 'gzip', 'bz2', 'lzma'])
+def test_round_trip(compression):
+    data = write(compression)
+    assert read(data) == expected()
+    assert read(data, compression) == expected()
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'gzip', 'bz2', 'lzma'])
+def test_compressed_is_smaller(compression):
+    assert len(write(compression)) < len(write(None)) / 5
+
+
+class UnboundedDecompressor:
+    """A bz2 or lzma decompressor as found before Python 3.5."""
+
+    def __init__(self, decompressor):
+        self._decompressor = decompressor
+
+    def decompress(self, data):
+        return self._decompressor.decompress(data)
+
+    @property
+    def eof(self):
+        return self._decompressor.eof
+
+    @property
+    def unused_data(self):
+        return self._decompressor.unused_data
+
+
+@pytest.mark.parametrize('compression', ['bz2', 'lzma'])
+def test_unbounded_decompressor(compression, monkeypatch):
+    decompressor = pygob.stream._decompressor
+    monkeypatch.setattr(pygob.stream, '_decompressor', lambda compression:
+                        UnboundedDecompressor(decompressor(compression)))
+    data = write(compression)
+    assert read(data, chunk_size=1000) == expected()
+    blocks = list(pygob.stream.decompress([data], compression, window=100))
+    assert max(len(block) for block in blocks) == 100
+
+
+def test_gzip_members():
+    data = gzip.compress(pygob.dump(1)) + gzip.compress(pygob.dump(2))
+    assert read(data) == [1, 2]
+
+
+def test_empty_stream():
+    assert read(b'') == []
+
+
+def test_truncated():
+    data = write('gzip')
+    with pytest.raises(AssertionError) as excinfo:
+        read(data[:len(data) // 2])
+    excinfo.match('truncated')
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        pygob.StreamWriter(io.BytesIO(), 'zip')
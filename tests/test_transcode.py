@@ -0,0 +1,102 @@
+import io
+import gzip
+import json
+import collections
+
+import pytest
+
+import pygob
+from pygob import transcode
+from pygob.__main__ import main
+from pygob.types import INT, FIRST_CUSTOM_TYPE
+
+Point = collections.namedtuple('Point', ['X', 'Y'])
+Person = collections.namedtuple('Person', ['Name', 'Age', 'Tags', 'Data'])
+
+
+def ndjson(data):
+    out = io.BytesIO()
+    transcode.transcode(io.BytesIO(data), out, 'ndjson')
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def dump_all(values):
+    dumper = pygob.Dumper()
+    return b''.join(dumper.dump(value) for value in values)
+
+
+def test_scalars():
+    data = dump_all([1, -2, 2.5, True, 'hello', b'\x00\xff', 1 + 2j])
+    assert ndjson(data) == [1, -2, 2.5, True, 'hello', 'AP8=', [1.0, 2.0]]
+
+
+def test_structs():
+    data = dump_all([Point(3, 4), Point(0, 0), Point(0, 7)])
+    assert ndjson(data) == [
+        {'X': 3, 'Y': 4},
+        {'X': 0, 'Y': 0},
+        {'X': 0, 'Y': 7},
+    ]
+
+
+def test_compound():
+    person = Person('Alice', 30, ['a', 'b'], {1: 2.5})
+    assert ndjson(dump_all([person, [[1, 2], [3]], (5, 6)])) == [
+        {'Name': 'Alice', 'Age': 30, 'Tags': ['a', 'b'], 'Data': {'1': 2.5}},
+        [[1, 2], [3]],
+        [5, 6],
+    ]
+
+
+def test_go_struct():
+    # Data encoded by Go with a nested struct.
+    data = [
+        50, 255, 149, 3, 1, 1, 6, 80, 101, 114, 115, 111, 110, 1, 255, 150, 0,
+        1, 3, 1, 4, 78, 97, 109, 101, 1, 12, 0, 1, 3, 65, 103, 101, 1, 4, 0, 1,
+        7, 65, 100, 100, 114, 101, 115, 115, 1, 255, 152, 0, 0, 0, 48, 255,
+        151, 3, 1, 1, 7, 65, 100, 100, 114, 101, 115, 115, 1, 255, 152, 0, 1,
+        2, 1, 6, 83, 116, 114, 101, 101, 116, 1, 12, 0, 1, 11, 72, 111, 117,
+        115, 101, 78, 117, 109, 98, 101, 114, 1, 4, 0, 0, 0, 25, 255, 150, 1,
+        5, 65, 108, 105, 99, 101, 1, 70, 1, 1, 7, 77, 97, 105, 110, 32, 83,
+        116, 1, 34, 0, 0
+    ]
+    assert ndjson(bytes(data)) == [{
+        'Name': 'Alice',
+        'Age': 35,
+        'Address': {'Street': 'Main St', 'HouseNumber': 17},
+    }]
+
+
+def test_recursive():
+    # type Node struct { Value int; Next *Node }
+    Node = collections.namedtuple('Node', ['Value', 'Next'])
+    dumper = pygob.Dumper()
+    dumper.register(Node, [('Value', INT), ('Next', FIRST_CUSTOM_TYPE)])
+    data = dumper.dump(Node(1, Node(2, None))) + dumper.dump(Node(0, None))
+    assert list(pygob.load_all(data)) == [Node(1, Node(2, None)),
+                                          Node(0, None)]
+    assert ndjson(data) == [
+        {'Value': 1, 'Next': {'Value': 2, 'Next': None}},
+        {'Value': 0, 'Next': None},
+    ]
+
+
+def test_msgpack():
+    transcoder = transcode.Transcoder('msgpack')
+    data = dump_all([Point(3, -4), 'hi', [True, False], 300])
+    assert transcoder.feed(data) == (
+        b'\x82\xa1X\x03\xa1Y\xfc' + b'\xa2hi' + b'\x92\xc3\xc2' +
+        b'\xcf' + (300).to_bytes(8, 'big'))
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        transcode.Transcoder('xml')
+
+
+def test_cli(tmpdir):
+    src = tmpdir.join('points.gob.gz')
+    dst = tmpdir.join('points.ndjson')
+    src.write_binary(gzip.compress(dump_all([Point(1, 2), Point(3, 4)])))
+    main(['transcode', str(src), str(dst)])
+    assert dst.read_binary() == b'{"X":1,"Y":2}\n{"X":3,"Y":4}\n'